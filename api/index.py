@@ -1,9 +1,10 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import StreamingResponse, FileResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
+from datetime import datetime
 import sys
 import os
 
@@ -11,9 +12,22 @@ import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app.ahp import AHPCalculator
-from app.models import RecommendationResponse, Crop, Recommendation, UserInputSubmission, Question
-from app.database import get_supabase_client
+from app.models import RecommendationResponse, Crop, Recommendation, UserInputSubmission, Question, SensitivityRequest, SensitivityResponse, WhatIfSessionResponse, WhatIfDiffResponse, AdaptiveQuestionRequest, AdaptiveQuestionResponse, Histogram, SoilCount, TimeBucket, AnalyticsSummary, ChatCacheStats, ProfileCapture, ProfileArmRequest, TelemetryBatch, TelemetryResponse, SeasonalRequest, SeasonalResponse, SeasonalBatchRequest, SeasonalBatchResponse, SeasonalFarmResult
+from app.database import get_supabase_client, get_supabase_admin_client
+from app.catalog import catalog
 from app.mapping import get_questions, map_answers_to_values
+from app.sensitivity import SensitivityAnalyzer, check_analysis_size
+from app.whatif import WhatIfStore
+from app.adaptive import AdaptiveQuestionnaire
+from app.climate import climate
+from app.scoring import ScoringRegistry
+from app.seasonal import SeasonalScorer, validate_series, check_size
+from app.admin import require_admin
+from app import analytics
+from app.chat_cache import chat_cache
+from app.profiling import profiler, install_profiling
+from app.bundle import catalog_bundle
+from app.static_assets import StaticAssetStore, asset_response
 
 app = FastAPI(title="Sistem Rekomendasi Tanaman AHP")
 
@@ -26,60 +40,343 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request profiling (only installed when PROFILING_ENABLED=1)
+install_profiling(app)
+
 # Initialize AHP Calculator
 ahp_calculator = AHPCalculator()
+sensitivity_analyzer = SensitivityAnalyzer(ahp_calculator)
+whatif_store = WhatIfStore(ahp_calculator)
+adaptive_questionnaire = AdaptiveQuestionnaire(ahp_calculator)
+scoring = ScoringRegistry(ahp_calculator)
+seasonal_scorer = SeasonalScorer(ahp_calculator)
+
+def save_user_input(supabase, technical_values: dict):
+    save_user_inputs(supabase, [technical_values])
+
+def save_user_inputs(supabase, values_list: List[dict]) -> bool:
+    # One insert for the whole batch (telemetry uploads many submissions at once)
+    user_input_data = [{
+        "ph_value": technical_values.get('ph'),
+        "rain_value": technical_values.get('rain'),
+        "temp_value": technical_values.get('temp'),
+        "sun_value": technical_values.get('sun'),
+        "irrigation_value": technical_values.get('irrigation'),
+        "soil_type": technical_values.get('soil')
+    } for technical_values in values_list]
+    try:
+       supabase.table('user_inputs').insert(user_input_data).execute()
+       return True
+    except Exception as e:
+       print(f"Warning: Failed to save user input to DB: {e}")
+       # Don't fail the whole request just because tracking failed
+       return False
+
+def get_scoring_engine(method: Optional[str]):
+    try:
+        return scoring.get(method)
+    except KeyError as e:
+        raise HTTPException(status_code=400, detail=e.args[0])
 
 # --- Get Questions Endpoint ---
 @app.get("/api/questions", response_model=List[Question])
 async def get_questions_endpoint():
     return get_questions()
 
+@app.get("/api/scoring/methods", response_model=List[str])
+async def get_scoring_methods():
+    return scoring.names()
+
+# --- Adaptive Questionnaire Endpoint ---
+@app.post("/api/questions/next", response_model=AdaptiveQuestionResponse)
+async def get_next_questions(request: AdaptiveQuestionRequest):
+    try:
+        supabase = get_supabase_client()
+
+        answers_dicts = [{"question_id": a.question_id, "selected_option": a.selected_option} for a in request.answers]
+
+        crops = catalog.get_crops(supabase)
+
+        if not crops:
+            raise HTTPException(status_code=404, detail="No crops found in database")
+
+        record = climate.lookup(request.lat, request.lon)
+
+        return adaptive_questionnaire.next_questions(answers_dicts, crops, request.top_k, record, climate.blend_weight)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Adaptive Questionnaire Error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 # --- Recommend Endpoint ---
 @app.post("/api/recommend", response_model=RecommendationResponse)
 async def get_recommendations(submission: UserInputSubmission):
+    engine = get_scoring_engine(submission.method)
     try:
         supabase = get_supabase_client()
         
         answers_dicts = [{"question_id": a.question_id, "selected_option": a.selected_option} for a in submission.answers]
         technical_values = map_answers_to_values(answers_dicts)
+
+        # Optional location: rain/temp are filled in from the regional climate grid
+        record = climate.lookup(submission.lat, submission.lon)
+        technical_values = climate.apply(technical_values, answers_dicts, record)
         
         print(f"Calculated Technical Values: {technical_values}")
 
-        response = supabase.table('crops').select("*").execute()
-        crops_data = response.data
-        crops = [Crop(**item) for item in crops_data]
+        crops = catalog.get_crops(supabase)
         
         if not crops:
             raise HTTPException(status_code=404, detail="No crops found in database")
 
-        user_input_data = {
-            "ph_value": technical_values.get('ph'),
-            "rain_value": technical_values.get('rain'),
-            "temp_value": technical_values.get('temp'),
-            "sun_value": technical_values.get('sun'),
-            "irrigation_value": technical_values.get('irrigation'),
-            "soil_type": technical_values.get('soil')
-        }
-        try:
-           supabase.table('user_inputs').insert(user_input_data).execute()
-        except Exception as e:
-           print(f"Warning: Failed to save user input to DB: {e}")
+        save_user_input(supabase, technical_values)
         
-        recommendations = ahp_calculator.rank_crops(technical_values, crops)
+        recommendations = ahp_calculator.rank_crops(technical_values, crops, engine)
         
-        return RecommendationResponse(recommendations=recommendations)
+        return RecommendationResponse(recommendations=recommendations, climate=record, method=engine.name)
     except Exception as e:
         print(f"Error: {e}")
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/whatif", response_model=WhatIfSessionResponse)
+async def create_whatif_session(submission: UserInputSubmission):
+    try:
+        supabase = get_supabase_client()
+        answers = {a.question_id: a.selected_option for a in submission.answers}
+
+        crops = catalog.get_crops(supabase)
+
+        if not crops:
+            raise HTTPException(status_code=404, detail="No crops found in database")
+
+        engine = get_scoring_engine(submission.method)
+        record = climate.lookup(submission.lat, submission.lon)
+        session, recommendations = whatif_store.create(answers, crops, catalog.version(supabase), record, engine)
+        save_user_input(supabase, session.values)
+
+        return WhatIfSessionResponse(session_id=session.session_id, recommendations=recommendations,
+                                     climate=record, method=engine.name)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"What-if Error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/whatif/{session_id}", response_model=WhatIfDiffResponse)
+async def update_whatif_session(session_id: str, submission: UserInputSubmission):
+    try:
+        supabase = get_supabase_client()
+
+        session = whatif_store.get(session_id, catalog.version(supabase))
+        if session is None:
+            raise HTTPException(status_code=404, detail="What-if session not found or expired")
+
+        answers = {a.question_id: a.selected_option for a in submission.answers}
+        engine = get_scoring_engine(submission.method) if submission.method else None
+        changed, changes = whatif_store.update(session, answers, climate.lookup(submission.lat, submission.lon), engine)
+
+        if changed:
+            save_user_input(supabase, session.values)
+
+        return WhatIfDiffResponse(session_id=session_id, changed_criteria=changed, changes=changes)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"What-if Error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/sensitivity", response_model=SensitivityResponse)
+async def get_sensitivity(request: SensitivityRequest):
+    try:
+        supabase = get_supabase_client()
+
+        answers_dicts = [{"question_id": a.question_id, "selected_option": a.selected_option} for a in request.answers]
+        technical_values = map_answers_to_values(answers_dicts)
+
+        crops = catalog.get_crops(supabase)
+
+        if not crops:
+            raise HTTPException(status_code=404, detail="No crops found in database")
+
+        try:
+            check_analysis_size(request.samples, len(crops))
+        except ValueError as e:
+            raise HTTPException(status_code=413, detail=str(e))
+
+        # CPU-bound Monte Carlo runs in the threadpool so the event loop keeps serving other clients
+        return await run_in_threadpool(
+            sensitivity_analyzer.analyze,
+            technical_values, crops,
+            samples=request.samples, spread=request.spread,
+            top_k=request.top_k, seed=request.seed
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Sensitivity Error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+# --- Seasonal suitability: best planting month per crop from a climate series ---
+@app.post("/api/recommend/seasonal", response_model=SeasonalResponse)
+async def get_seasonal_recommendations(request: SeasonalRequest):
+    engine = get_scoring_engine(request.method)
+    try:
+        supabase = get_supabase_client()
+
+        answers_dicts = [{"question_id": a.question_id, "selected_option": a.selected_option} for a in request.answers]
+        technical_values = map_answers_to_values(answers_dicts)
+
+        crops = catalog.get_crops(supabase)
+
+        if not crops:
+            raise HTTPException(status_code=404, detail="No crops found in database")
+
+        try:
+            check_size(len(crops), [validate_series(request.rain, request.temp)], len(ahp_calculator.criteria), engine)
+        except ValueError as e:
+            raise HTTPException(status_code=413 if "too large" in str(e) else 400, detail=str(e))
+
+        # CPU-bound scoring runs in the threadpool so the event loop keeps serving other clients
+        recommendations = await run_in_threadpool(seasonal_scorer.rank, technical_values, crops, request.rain,
+                                                  request.temp, engine, request.top_k, request.include_windows)
+
+        # Tracked with the annual equivalent of the series (total rain, mean temperature)
+        technical_values.update(rain=sum(request.rain), temp=sum(request.temp) / len(request.temp))
+        save_user_input(supabase, technical_values)
+
+        return SeasonalResponse(recommendations=recommendations, method=engine.name, steps=len(request.rain))
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f"Seasonal Error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/recommend/seasonal/batch", response_model=SeasonalBatchResponse)
+async def get_seasonal_recommendations_batch(request: SeasonalBatchRequest):
+    engine = get_scoring_engine(request.method)
+    try:
+        supabase = get_supabase_client()
+        crops = catalog.get_crops(supabase)
+
+        if not crops:
+            raise HTTPException(status_code=404, detail="No crops found in database")
+
+        # Validate every series and the total work (crops x steps x criteria x farms) before scoring anything
+        steps = []
+        for index, farm in enumerate(request.farms):
+            try:
+                steps.append(validate_series(farm.rain, farm.temp))
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=f"farms[{index}]: {e}")
+        try:
+            check_size(len(crops), steps, len(ahp_calculator.criteria), engine)
+        except ValueError as e:
+            raise HTTPException(status_code=413, detail=str(e))
+
+        def rank_farms() -> List[SeasonalFarmResult]:
+            results = []
+            for farm in request.farms:
+                answers_dicts = [{"question_id": a.question_id, "selected_option": a.selected_option} for a in farm.answers]
+                recommendations = seasonal_scorer.rank(map_answers_to_values(answers_dicts), crops, farm.rain, farm.temp,
+                                                       engine, request.top_k)
+                results.append(SeasonalFarmResult(id=farm.id, recommendations=recommendations))
+            return results
+
+        # CPU-bound scoring runs in the threadpool so the event loop keeps serving other clients
+        results = await run_in_threadpool(rank_farms)
+
+        return SeasonalBatchResponse(farms=results, method=engine.name)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Seasonal Batch Error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+# --- Analytics (admin only; aggregates are maintained by a trigger in schema.sql and read with the service role key) ---
+@app.get("/api/analytics/summary", response_model=AnalyticsSummary, dependencies=[Depends(require_admin)])
+async def analytics_summary(interval: str = "day"):
+    try:
+        return analytics.get_summary(get_supabase_admin_client(), interval)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/analytics/histogram/{metric}", response_model=Histogram, dependencies=[Depends(require_admin)])
+async def analytics_histogram(metric: str):
+    if metric not in analytics.HISTOGRAM_BUCKETS:
+        raise HTTPException(status_code=404, detail=f"Unknown metric: {metric}")
+    try:
+        return analytics.get_histogram(get_supabase_admin_client(), metric)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/analytics/soil", response_model=List[SoilCount], dependencies=[Depends(require_admin)])
+async def analytics_soil():
+    try:
+        return analytics.get_soil_distribution(get_supabase_admin_client())
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/analytics/counts", response_model=List[TimeBucket], dependencies=[Depends(require_admin)])
+async def analytics_counts(interval: str = "day", since: Optional[datetime] = None, until: Optional[datetime] = None):
+    if interval not in ("hour", "day", "week"):
+        raise HTTPException(status_code=400, detail="interval must be hour, day or week")
+    try:
+        return analytics.get_time_counts(get_supabase_admin_client(), interval, since, until)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/analytics/export", dependencies=[Depends(require_admin)])
+async def analytics_export(format: str = "ndjson", since: Optional[datetime] = None):
+    if format not in ("ndjson", "csv"):
+        raise HTTPException(status_code=400, detail="format must be ndjson or csv")
+    supabase = get_supabase_admin_client()
+    rows = analytics.iter_user_inputs(supabase, since)
+    if format == "csv":
+        return StreamingResponse(analytics.export_csv(rows), media_type="text/csv",
+                                 headers={"Content-Disposition": "attachment; filename=user_inputs.csv"})
+    return StreamingResponse(analytics.export_ndjson(rows), media_type="application/x-ndjson")
+
+# --- Catalog bundle for client-side ranking (static/ranking.js) ---
+@app.get("/api/catalog/bundle")
+async def get_catalog_bundle(request: Request):
+    try:
+        supabase = get_supabase_client()
+        crops = catalog.get_crops(supabase)
+
+        if not crops:
+            raise HTTPException(status_code=404, detail="No crops found in database")
+
+        asset = catalog_bundle.get(ahp_calculator, crops, catalog.version(supabase))
+        # no-cache: the browser revalidates with If-None-Match and gets a 304 while the catalog is unchanged
+        return asset_response(asset, request)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Catalog Bundle Error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+# --- Telemetry: batched submissions that were ranked in the browser ---
+@app.post("/api/telemetry", response_model=TelemetryResponse)
+async def post_telemetry(batch: TelemetryBatch):
+    # Technical values are recomputed here; the client only reports the raw answers
+    values_list = [
+        map_answers_to_values([{"question_id": a.question_id, "selected_option": a.selected_option} for a in event.answers])
+        for event in batch.events
+    ]
+    if not save_user_inputs(get_supabase_client(), values_list):
+        raise HTTPException(status_code=503, detail="Failed to save telemetry")
+    return TelemetryResponse(accepted=len(values_list))
+
 @app.get("/api/crops", response_model=List[Crop])
 async def get_crops():
     try:
         supabase = get_supabase_client()
-        response = supabase.table('crops').select("*").execute()
-        return [Crop(**item) for item in response.data]
+        return catalog.get_crops(supabase)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -102,16 +399,48 @@ async def chat_endpoint(request: ChatRequest):
         print(f"Chat Error: {e}")
         return {"response": "Maaf, terjadi kesalahan pada sistem AI. Pastikan API Key sudah benar."}
 
-# Serve static files
+@app.get("/api/chat/cache", response_model=ChatCacheStats, dependencies=[Depends(require_admin)])
+async def chat_cache_stats():
+    return chat_cache.stats()
+
+@app.delete("/api/chat/cache", response_model=ChatCacheStats, dependencies=[Depends(require_admin)])
+async def clear_chat_cache():
+    chat_cache.clear()
+    return chat_cache.stats()
+
+# --- Profiling (admin only) ---
+@app.get("/api/admin/profiles", response_model=List[ProfileCapture], dependencies=[Depends(require_admin)])
+async def list_profiles():
+    return profiler.store.list()
+
+@app.get("/api/admin/profiles/{capture_id}", dependencies=[Depends(require_admin)])
+async def download_profile(capture_id: str, format: str = "txt"):
+    # txt = ringkasan cProfile, prof = data cProfile mentah (snakeviz), folded = stack sampling
+    if format not in ("txt", "prof", "folded"):
+        raise HTTPException(status_code=400, detail="format must be txt, prof or folded")
+    path = profiler.store.file(capture_id, format)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    media_type = "application/octet-stream" if format == "prof" else "text/plain"
+    return FileResponse(path, media_type=media_type, filename=f"{capture_id}.{format}")
+
+@app.post("/api/admin/profiles/arm", dependencies=[Depends(require_admin)])
+async def arm_profiler(request: ProfileArmRequest):
+    if not profiler.enabled:
+        raise HTTPException(status_code=409, detail="Profiling is disabled (set PROFILING_ENABLED=1)")
+    profiler.arm(request.count, request.path_prefix)
+    return {"armed": profiler.armed(), "path_prefix": request.path_prefix}
+
+# Serve static files from memory (loaded and precompressed once at startup)
 static_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "static")
+static_store = StaticAssetStore(static_path)
 
 @app.get("/")
-async def serve_index():
-    return FileResponse(os.path.join(static_path, "index.html"))
+async def serve_index(request: Request):
+    return static_store.response("index.html", request)
 
 @app.get("/{filename:path}")
-async def serve_static(filename: str):
-    file_path = os.path.join(static_path, filename)
-    if os.path.exists(file_path):
-        return FileResponse(file_path)
-    return FileResponse(os.path.join(static_path, "index.html"))
+async def serve_static(filename: str, request: Request):
+    if filename.startswith("api/"):
+        raise HTTPException(status_code=404, detail="Not Found")
+    return static_store.response(filename, request)
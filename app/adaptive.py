@@ -0,0 +1,109 @@
+import itertools
+import numpy as np
+from typing import List, Dict, Optional, Tuple
+from app.ahp import AHPCalculator, crop_arrays, criterion_scores
+from app.mapping import QUESTIONS_DATA, category_value
+from app.models import Crop, Question, ClimateRecord, AdaptiveQuestionResponse
+from app.climate import CLIMATE_CATEGORIES, DEFAULT_BLEND_WEIGHT, blend_value
+
+# Margin pembanding skor. Peringkat akhir memakai skor yang dibulatkan ke 4 desimal,
+# jadi selisih di bawah setengah satuan pembulatan dianggap masih bisa seri.
+SCORE_MARGIN = 5e-5
+
+
+class AdaptiveQuestionnaire:
+    """
+    Kuesioner adaptif: setelah setiap jawaban, hitung batas bawah/atas skor setiap
+    tanaman atas seluruh kemungkinan jawaban sisa pertanyaan (termasuk dilewati).
+    Jika tidak ada kemungkinan jawaban yang bisa mengubah himpunan top-k,
+    kuesioner selesai; jika ada, hanya pertanyaan yang masih berpengaruh dikirim.
+    """
+    def __init__(self, ahp_calculator: AHPCalculator, questions: List[dict] = QUESTIONS_DATA):
+        self.ahp = ahp_calculator
+        self.questions = questions
+        self.by_id = {q['id']: q for q in questions}
+
+    def possible_values(self, category: str, answered: List[float], unanswered: List[dict],
+                        climate: Optional[ClimateRecord] = None, blend_weight: float = DEFAULT_BLEND_WEIGHT) -> list:
+        """
+        Seluruh nilai teknis yang mungkin untuk satu kategori: setiap pertanyaan yang
+        belum dijawab bisa dijawab dengan opsi mana pun atau dilewati.
+        Dihitung dengan category_value (dan blend_value jika ada data iklim),
+        sama persis seperti map_answers_to_values dan blend_climate.
+        """
+        choices = [list(q['values'].values()) + [None] for q in unanswered]
+        values = set()
+        for combination in itertools.product(*choices):
+            vals = answered + [v for v in combination if v is not None]
+            value = category_value(category, vals)
+            if climate is not None and category in CLIMATE_CATEGORIES:
+                value = blend_value(category, value, climate, bool(vals), blend_weight)
+            values.add(value)
+        return sorted(values)
+
+    def score_bounds(self, answers: List[Dict[str, str]], crops: List[Crop], climate: Optional[ClimateRecord] = None,
+                     blend_weight: float = DEFAULT_BLEND_WEIGHT) -> Tuple[np.ndarray, np.ndarray, np.ndarray, Dict[str, List[dict]]]:
+        """
+        Mengembalikan (batas bawah, batas atas, rentang skor tertimbang per kriteria, sisa pertanyaan per kategori).
+        Skor AHP adalah jumlah tertimbang per kriteria yang saling bebas, sehingga batas
+        total = jumlah min/maks tiap kriteria, dan batas ini tercapai (bukan sekadar perkiraan).
+        """
+        answered_values = {c: [] for c in self.ahp.criteria}
+        answered_ids = set()
+        for ans in answers:
+            question = self.by_id.get(ans.get('question_id'))
+            code = ans.get('selected_option')
+            if question and code in question['values']:
+                answered_values[question['category']].append(question['values'][code])
+                answered_ids.add(question['id'])
+
+        remaining = {c: [] for c in self.ahp.criteria}
+        for q in self.questions:
+            if q['id'] not in answered_ids:
+                remaining[q['category']].append(q)
+
+        arrays = crop_arrays(crops)
+        lower = np.zeros(len(crops))
+        upper = np.zeros(len(crops))
+        spread = np.zeros((len(crops), len(self.ahp.criteria)))
+        for j, criterion in enumerate(self.ahp.criteria):
+            weight = self.ahp.weights[criterion]
+            values = self.possible_values(criterion, answered_values[criterion], remaining[criterion], climate, blend_weight)
+            # Skor kriteria ini untuk setiap kemungkinan nilai (nilai x tanaman).
+            scores = np.array([criterion_scores(criterion, v, arrays) for v in values]) * weight
+            low, high = scores.min(axis=0), scores.max(axis=0)
+            lower += low
+            upper += high
+            spread[:, j] = high - low
+
+        return lower, upper, spread, remaining
+
+    def next_questions(self, answers: List[Dict[str, str]], crops: List[Crop], top_k: int = 3,
+                       climate: Optional[ClimateRecord] = None, blend_weight: float = DEFAULT_BLEND_WEIGHT) -> AdaptiveQuestionResponse:
+        lower, upper, spread, remaining = self.score_bounds(answers, crops, climate, blend_weight)
+        n = len(crops)
+
+        # Pasti masuk: kurang dari k tanaman lain yang skor maksimalnya bisa menyamai skor minimalnya.
+        # (Dirinya sendiri selalu terhitung karena upper >= lower, jadi dikurangi satu.)
+        could_beat = n - np.searchsorted(np.sort(upper), lower - SCORE_MARGIN, side='left') - 1
+        certain_in = could_beat < top_k
+        # Pasti keluar: minimal k tanaman yang skor minimalnya pasti di atas skor maksimalnya.
+        always_beat = n - np.searchsorted(np.sort(lower), upper + SCORE_MARGIN, side='right')
+        certain_out = always_beat >= top_k
+        contested = ~(certain_in | certain_out)
+
+        questions = []
+        if contested.any():
+            # Hanya kategori yang masih menggeser skor tanaman yang diperebutkan.
+            varies = spread[contested].max(axis=0) > 0
+            for j, criterion in enumerate(self.ahp.criteria):
+                if varies[j]:
+                    questions.extend(remaining[criterion])
+
+        settled = sorted(np.flatnonzero(certain_in), key=lambda i: -lower[i])
+        return AdaptiveQuestionResponse(
+            done=not questions,
+            questions=[Question(**q) for q in self.questions if q in questions],
+            settled=[crops[i].name for i in settled],
+            contested=int(contested.sum())
+        )
@@ -0,0 +1,23 @@
+import os
+import hmac
+from typing import Optional
+from fastapi import Header, HTTPException
+
+
+def is_admin_token(token: Optional[str]) -> bool:
+    """
+    True jika token sama dengan ADMIN_TOKEN (dan ADMIN_TOKEN diset).
+    """
+    expected = os.environ.get("ADMIN_TOKEN")
+    return bool(expected and token and hmac.compare_digest(token, expected))
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """
+    Dependency untuk endpoint internal (analitik, ekspor data).
+    Token dibandingkan dengan ADMIN_TOKEN; jika ADMIN_TOKEN tidak diset, endpoint dinonaktifkan.
+    """
+    if not os.environ.get("ADMIN_TOKEN"):
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled (ADMIN_TOKEN not set)")
+    if not is_admin_token(x_admin_token):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
@@ -1,8 +1,9 @@
 import numpy as np
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
 # Mengimpor model data yang digunakan untuk menyimpan kriteria tanaman,
 # hasil rekomendasi, dan detail kecocokan.
 from app.models import Crop, Recommendation, MatchDetails
+from app.soil import soil_compatibility
 
 class AHPCalculator:
     """
@@ -96,10 +97,8 @@ class AHPCalculator:
         """
         if is_categorical:
             # Kecocokan untuk nilai kategorikal (misalnya, Jenis Tanah).
-            # Melakukan pencocokan sederhana.
-            if str(user_val).lower() in str(crop_val).lower() or str(crop_val).lower() in str(user_val).lower():
-                return 1.0 # Cocok sempurna
-            return 0.0 # Tidak cocok
+            # Menggunakan tabel kecocokan parsial antar jenis tanah (lihat app/soil.py).
+            return soil_compatibility.pair_score(user_val, crop_val)
             
         # Kecocokan untuk rentang numerik
         
@@ -124,68 +123,189 @@ class AHPCalculator:
         # Penurunan skor linier berdasarkan jarak terhadap toleransi.
         return 1.0 - (dist / tolerance)
 
-    def rank_crops(self, user_inputs: Dict[str, any], crops: List[Crop]) -> List[Recommendation]:
+    def batch_weights(self, matrices: np.ndarray) -> np.ndarray:
+        """
+        Versi vektor dari _calculate_weights untuk banyak matriks sekaligus.
+        Input berbentuk (sampel x n x n), output berbentuk (sampel x n).
+        """
+        # Normalisasi kolom lalu rata-rata baris, sama seperti _calculate_weights.
+        column_sums = matrices.sum(axis=1, keepdims=True)
+        return (matrices / column_sums).mean(axis=2)
+
+    def batch_consistency_ratio(self, matrices: np.ndarray, weights: np.ndarray) -> np.ndarray:
+        """
+        Versi vektor dari _calculate_consistency_ratio (satu CR per sampel).
+        """
+        n = len(self.criteria)
+        weighted_sum = np.einsum('sij,sj->si', matrices, weights)
+        lambda_max = (weighted_sum / weights).mean(axis=1)
+        ci = (lambda_max - n) / (n - 1)
+        return ci / 1.24
+
+    def match_matrix(self, user_inputs: Dict[str, any], crops: List[Crop]) -> np.ndarray:
+        """
+        Menghitung skor kecocokan seluruh kriteria untuk seluruh tanaman sekaligus.
+        Mengembalikan matriks (jumlah tanaman x 6) dengan urutan kolom self.criteria.
+        Hasilnya identik dengan memanggil calculate_match_score per tanaman.
+        """
+        arrays = crop_arrays(crops)
+        matrix = np.empty((len(crops), len(self.criteria)))
+        for j, criterion in enumerate(self.criteria):
+            matrix[:, j] = criterion_scores(criterion, user_inputs[criterion], arrays)
+        return matrix
+
+    def rank_crops(self, user_inputs: Dict[str, any], crops: List[Crop], engine=None) -> List[Recommendation]:
         """
         Menghitung skor AHP untuk setiap tanaman berdasarkan input pengguna dan memberikan peringkat.
+        Metode agregasi lain (TOPSIS, Fuzzy AHP) dapat dipilih lewat `engine` (lihat app/scoring.py).
         """
-        recommendations = []
-        
-        for crop in crops:
-            # Hitung skor kecocokan (S_i) untuk setiap kriteria:
-            
-            # pH (Numerik)
-            s_ph = self.calculate_match_score(user_inputs['ph'], crop.ph_min, crop.ph_max)
-            
-            # Curah Hujan (Numerik)
-            s_rain = self.calculate_match_score(user_inputs['rain'], crop.rain_min, crop.rain_max)
-            
-            # Suhu (Numerik)
-            s_temp = self.calculate_match_score(user_inputs['temp'], crop.temp_min, crop.temp_max)
-            
-            # Sinar Matahari (Dikonversi dari kategorikal ke rentang numerik 0-1 untuk perbandingan)
-            sun_map = {'Low': 0.3, 'Medium': 0.6, 'High': 1.0}
-            crop_sun_val = sun_map.get(crop.sun_requirement, 0.6)
-            # Dibuat rentang kecil sekitar nilai konversi untuk skor kecocokan
-            s_sun = self.calculate_match_score(user_inputs['sun'], crop_sun_val - 0.2, crop_sun_val + 0.2)
-            
-            # Irigasi (Dikonversi dari kategorikal ke rentang numerik 0-1)
-            irr_map = {'Low': 0.3, 'Medium': 0.6, 'High': 1.0}
-            crop_irr_val = irr_map.get(crop.irrigation_need, 0.6)
-            s_irr = self.calculate_match_score(user_inputs['irrigation'], crop_irr_val - 0.2, crop_irr_val + 0.2)
-            
-            # Tanah (Kategorikal) - min_val/max_val diabaikan, is_categorical=True digunakan
-            s_soil = self.calculate_match_score(user_inputs['soil'], 0, 0, is_categorical=True, crop_val=crop.soil_type)
-            
+        # Skor kecocokan (S_i) seluruh tanaman dihitung sekaligus dalam satu matriks.
+        matrix = self.match_matrix(user_inputs, crops)
+
+        if engine is not None:
+            final_scores = engine.scores(matrix)
+        else:
             # Hitung Jumlah Tertimbang (Skor AHP Akhir)
             # Skor Akhir = Sum(Bobot_i * Skor_Kecocokan_i)
-            
-            final_score = (
-                self.weights['ph'] * s_ph +
-                self.weights['rain'] * s_rain +
-                self.weights['temp'] * s_temp +
-                self.weights['sun'] * s_sun +
-                self.weights['irrigation'] * s_irr +
-                self.weights['soil'] * s_soil
-            )
-            
+            weights_vector = np.array([self.weights[c] for c in self.criteria])
+            final_scores = matrix @ weights_vector
+
+        return self.build_recommendations(crops, matrix, final_scores)
+
+    def build_recommendations(self, crops: List[Crop], matrix: np.ndarray, final_scores: np.ndarray) -> List[Recommendation]:
+        """
+        Menyusun daftar rekomendasi terurut dari matriks kecocokan dan skor akhir.
+        """
+        recommendations = []
+        for crop, row, final_score in zip(crops, matrix, final_scores):
             # Simpan rincian skor kecocokan
-            match_details = MatchDetails(
-                ph=s_ph,
-                rain=s_rain,
-                temp=s_temp,
-                sun=s_sun,
-                irrigation=s_irr,
-                soil=s_soil
-            )
-            
+            match_details = MatchDetails(**dict(zip(self.criteria, row.tolist())))
+
             # Tambahkan hasil rekomendasi
             recommendations.append(Recommendation(
                 crop_name=crop.name,
-                score=round(final_score, 4),
+                score=round(float(final_score), 4),
                 match_details=match_details
             ))
             
         # Urutkan rekomendasi berdasarkan skor dari yang tertinggi ke terendah
         recommendations.sort(key=lambda x: x.score, reverse=True)
         
-        return recommendations
\ No newline at end of file
+        return recommendations
+
+
+# Konversi kebutuhan kategorikal (Sinar Matahari, Irigasi) ke nilai numerik 0-1.
+LEVEL_MAP = {'Low': 0.3, 'Medium': 0.6, 'High': 1.0}
+# Lebar rentang (+/-) di sekitar nilai konversi tersebut.
+LEVEL_TOLERANCE = 0.2
+
+# Lama musim tanam (bulan) untuk tanaman yang kolom season_months-nya kosong.
+DEFAULT_SEASON_MONTHS = 4
+
+
+# Cache array untuk list katalog terakhir (katalog yang sama dipakai ulang antar request).
+_arrays_cache: Tuple[Optional[List[Crop]], Optional[Dict[str, np.ndarray]]] = (None, None)
+
+
+def crop_arrays(crops: List[Crop]) -> Dict[str, np.ndarray]:
+    """
+    Menyusun kebutuhan tanaman menjadi array kolom agar skor kecocokan
+    dapat dihitung untuk seluruh katalog tanpa perulangan per tanaman.
+    Jenis tanah di-intern menjadi kode integer di sini, sekali per katalog.
+    """
+    global _arrays_cache
+    cached_crops, cached_arrays = _arrays_cache
+    if cached_crops is crops:
+        return cached_arrays
+
+    arrays = {
+        "ph_min": np.array([c.ph_min for c in crops], dtype=float),
+        "ph_max": np.array([c.ph_max for c in crops], dtype=float),
+        "rain_min": np.array([c.rain_min for c in crops], dtype=float),
+        "rain_max": np.array([c.rain_max for c in crops], dtype=float),
+        "temp_min": np.array([c.temp_min for c in crops], dtype=float),
+        "temp_max": np.array([c.temp_max for c in crops], dtype=float),
+        "soil_code": np.array([soil_compatibility.register(c.soil_type) for c in crops], dtype=int),
+    }
+    # Sinar Matahari dan Irigasi: rentang kecil (+/- LEVEL_TOLERANCE) sekitar nilai konversi
+    sun = np.array([LEVEL_MAP.get(c.sun_requirement, 0.6) for c in crops], dtype=float)
+    irr = np.array([LEVEL_MAP.get(c.irrigation_need, 0.6) for c in crops], dtype=float)
+    arrays["sun"], arrays["irrigation"] = sun, irr
+    arrays["sun_min"], arrays["sun_max"] = sun - LEVEL_TOLERANCE, sun + LEVEL_TOLERANCE
+    arrays["irrigation_min"], arrays["irrigation_max"] = irr - LEVEL_TOLERANCE, irr + LEVEL_TOLERANCE
+    # Lama musim tanam, dipakai penilaian musiman (app/seasonal.py)
+    arrays["season_months"] = np.array([c.season_months or DEFAULT_SEASON_MONTHS for c in crops], dtype=int)
+
+    _arrays_cache = (crops, arrays)
+    return arrays
+
+
+def range_match_scores(user_val, min_val, max_val) -> np.ndarray:
+    """
+    Versi vektor dari AHPCalculator.calculate_match_score untuk rentang numerik.
+    Mendukung broadcasting, misalnya banyak nilai pengguna terhadap banyak tanaman.
+    """
+    user_val = np.asarray(user_val, dtype=float)
+    range_width = np.asarray(max_val, dtype=float) - np.asarray(min_val, dtype=float)
+    range_width = np.where(range_width == 0, 1.0, range_width)
+    tolerance = range_width * 0.5
+
+    # Operasi in-place: hasil broadcasting bisa besar (tanaman x jendela di app/seasonal.py).
+    score = np.asarray(np.abs(user_val - min_val))
+    score = np.minimum(score, np.abs(user_val - max_val), out=score)
+    score /= tolerance
+    np.subtract(1.0, score, out=score)
+    np.maximum(score, 0.0, out=score)
+
+    # Di dalam rentang = 1.0, di luar toleransi = 0.0, di antaranya turun linier.
+    inside = min_val <= user_val
+    inside &= user_val <= max_val
+    np.copyto(score, 1.0, where=inside)
+    return score
+
+
+def score_units(scores: np.ndarray) -> np.ndarray:
+    """
+    Skor yang dibulatkan 4 desimal dalam satuan 1e-4 (int64), identik dengan
+    round(float(skor), 4) pada build_recommendations. np.rint bisa berbeda hanya jika skor
+    tepat di sekitar batas setengah (x * 1e4 berakhiran .5); nilai-nilai itu dibulatkan
+    ulang dengan round() Python.
+    """
+    scores = np.asarray(scores, dtype=float)
+    scaled = scores * 1e4
+    units = np.rint(scaled)
+    near_half = np.abs(np.abs(scaled - units) - 0.5) < 1e-6
+    if near_half.any():
+        units[near_half] = [round(round(float(x), 4) * 1e4) for x in scores[near_half]]
+    return units.astype(np.int64)
+
+
+def round_scores(scores: np.ndarray) -> np.ndarray:
+    """
+    Versi vektor dari round(float(skor), 4): k / 1e4 adalah float terdekat ke k x 10^-4,
+    sama seperti hasil round() Python.
+    """
+    return score_units(scores) / 1e4
+
+
+def ranking_order(scores: np.ndarray) -> np.ndarray:
+    """
+    Urutan peringkat yang sama dengan rank_crops: skor 4 desimal menurun, skor seri
+    mengikuti urutan katalog. Untuk array 2-D, per baris.
+    Kuncinya int64 unik (skor menurun, lalu indeks katalog), sehingga quicksort bawaan
+    memberi hasil yang sama dengan sort stabil tetapi jauh lebih cepat.
+    """
+    units = score_units(scores)
+    n = units.shape[-1]
+    keys = units * -n
+    keys += np.arange(n)
+    return np.argsort(keys, axis=-1)
+
+
+def criterion_scores(criterion: str, user_val, arrays: Dict[str, np.ndarray]) -> np.ndarray:
+    """
+    Skor kecocokan satu kriteria untuk seluruh tanaman (satu kolom matriks kecocokan).
+    """
+    if criterion == "soil":
+        return soil_compatibility.scores(user_val, arrays["soil_code"])
+    return range_match_scores(user_val, arrays[f"{criterion}_min"], arrays[f"{criterion}_max"])
@@ -1,14 +1,19 @@
 import os
+import hashlib
+from typing import Optional
 from google import genai
 from google.genai import types
 from app.ahp import AHPCalculator
 from app.database import get_supabase_client
-from app.models import Crop
+from app.catalog import catalog
+from app.chat_cache import chat_cache
+from app.climate import climate, blend_climate, CLIMATE_CATEGORIES
 
 # Initialize AHP
 ahp_calculator = AHPCalculator()
 
-def calculate_crop_recommendation(ph: float, rain: float, temp: float, sun: float, irrigation: float, soil: str):
+def calculate_crop_recommendation(ph: float, rain: float, temp: float, sun: float, irrigation: float, soil: str,
+                                  lat: Optional[float] = None, lon: Optional[float] = None):
     """
     Calculates crop recommendations based on land parameters using AHP.
     
@@ -19,13 +24,13 @@ def calculate_crop_recommendation(ph: float, rain: float, temp: float, sun: floa
         sun: Sun intensity (0.0 to 1.0). Low=0.3, Medium=0.6, High=1.0.
         irrigation: Irrigation availability (0.0 to 1.0). Low=0.3, Medium=0.6, High=1.0.
         soil: Soil type ('Clay', 'Sandy', 'Loam', 'Silt').
+        lat: Optional latitude of the farm. When given with lon, measured regional rainfall and temperature are blended in.
+        lon: Optional longitude of the farm.
     """
     try:
         # Fetch crops from DB
         supabase = get_supabase_client()
-        response = supabase.table('crops').select("*").execute()
-        crops_data = response.data
-        crops = [Crop(**item) for item in crops_data]
+        crops = catalog.get_crops(supabase)
         
         if not crops:
             return "Error: No crops found in database."
@@ -38,11 +43,19 @@ def calculate_crop_recommendation(ph: float, rain: float, temp: float, sun: floa
             "irrigation": irrigation,
             "soil": soil
         }
+
+        # The rain/temp given here are the model's estimates; blend them with measured climate data
+        record = climate.lookup(lat, lon)
+        user_input = blend_climate(user_input, record, set(CLIMATE_CATEGORIES), climate.blend_weight)
         
         recommendations = ahp_calculator.rank_crops(user_input, crops)
         
         # Format the output for the AI
         result_str = "Top Recommendations:\n"
+        if record is not None:
+            result_str = (f"Regional climate data (grid point {record.distance_km} km away): "
+                          f"rainfall {record.rain:.0f} mm/year, temperature {record.temp:.1f} C. "
+                          f"Used rainfall {user_input['rain']:.0f} mm/year, temperature {user_input['temp']:.1f} C.\n") + result_str
         for i, rec in enumerate(recommendations[:3]): # Top 3
             result_str += f"{i+1}. {rec.crop_name} (Score: {rec.score:.4f})\n"
             
@@ -57,52 +70,30 @@ def get_available_crops():
     """
     try:
         supabase = get_supabase_client()
-        response = supabase.table('crops').select("*").execute()
-        crops = response.data
+        crops = catalog.get_crops(supabase)
         
         if not crops:
             return "No crops found in database."
             
         result_str = "Available Crops and Parameters:\n"
         for crop in crops:
-            result_str += f"--- {crop['name']} ---\n"
-            result_str += f"Description: {crop['description']}\n"
-            result_str += f"pH Range: {crop['ph_min']} - {crop['ph_max']}\n"
-            result_str += f"Rainfall: {crop['rain_min']} - {crop['rain_max']} mm/year\n"
-            result_str += f"Temperature: {crop['temp_min']} - {crop['temp_max']} C\n"
-            result_str += f"Sun Requirement: {crop['sun_requirement']}\n"
-            result_str += f"Irrigation Need: {crop['irrigation_need']}\n"
-            result_str += f"Soil Type: {crop['soil_type']}\n\n"
+            result_str += f"--- {crop.name} ---\n"
+            result_str += f"Description: {crop.description}\n"
+            result_str += f"pH Range: {crop.ph_min} - {crop.ph_max}\n"
+            result_str += f"Rainfall: {crop.rain_min} - {crop.rain_max} mm/year\n"
+            result_str += f"Temperature: {crop.temp_min} - {crop.temp_max} C\n"
+            result_str += f"Sun Requirement: {crop.sun_requirement}\n"
+            result_str += f"Irrigation Need: {crop.irrigation_need}\n"
+            result_str += f"Soil Type: {crop.soil_type}\n\n"
             
         return result_str
     except Exception as e:
         return f"Error fetching crops: {str(e)}"
 
 # Configure Gemini
-def get_chat_response(message: str, history: list = []):
-    api_key = os.environ.get("GEMINI_API_KEY")
-    if not api_key:
-        return "Error: GEMINI_API_KEY not found in environment variables."
-        
-    client = genai.Client(api_key=api_key)
-    
-    # Define the tools
-    tools = [calculate_crop_recommendation, get_available_crops]
-    
-    # Transform history to the format expected by the new SDK if necessary
-    # The new SDK expects a list of Content objects or dicts. 
-    # Assuming 'history' is a list of simple dicts/objects from the frontend, 
-    # we might need to rely on the SDK's auto-conversion or manage the chat session manually.
-    
-    # For simplicity in this migration, let's create a chat session.
-    # Note: 'history' handling depends on what the frontend sends. 
-    # If it sends a list of {"role": ..., "parts": ...}, we can pass it.
-    
-    chat = client.chats.create(
-        model='gemini-flash-latest', # Verified working model
-        config=types.GenerateContentConfig(
-            tools=tools,
-            system_instruction="""
+CHAT_MODEL_NAME = 'gemini-flash-latest' # Verified working model
+
+SYSTEM_INSTRUCTION = """
             Anda adalah AgriSmart AI, pendamping petani yang ramah dan ahli.
             User Anda adalah petani awam yang mungkin tidak tahu istilah teknis seperti "pH tanah", "mm/tahun", atau "derajat Celcius".
             
@@ -142,6 +133,9 @@ def get_chat_response(message: str, history: list = []):
                 - Mudah dibentuk/Gembur -> Loam
                 - Hancur/Pasir -> Sandy
             
+            Jika user menyebut lokasi lahan (desa/kecamatan/kota), perkirakan koordinatnya dan sertakan sebagai `lat` dan `lon`
+            saat memanggil tool; data curah hujan dan suhu regional akan dipakai untuk melengkapi taksiran Anda.
+            
             SETELAH ANDA MENDAPATKAN SEMUA INFORMASI (melalui perkiraan Anda dari jawaban user):
             Panggil tool `calculate_crop_recommendation` dengan nilai-nilai taksiran Anda.
             
@@ -154,6 +148,31 @@ def get_chat_response(message: str, history: list = []):
             
             JANGAN GUNAKAN ISTILAH TEKNIS KECUALI DITANYA.
             """
+
+def gemini_chat_model(message: str, history: list = []):
+    api_key = os.environ.get("GEMINI_API_KEY")
+    if not api_key:
+        return "Error: GEMINI_API_KEY not found in environment variables."
+        
+    client = genai.Client(api_key=api_key)
+    
+    # Define the tools
+    tools = [calculate_crop_recommendation, get_available_crops]
+    
+    # Transform history to the format expected by the new SDK if necessary
+    # The new SDK expects a list of Content objects or dicts. 
+    # Assuming 'history' is a list of simple dicts/objects from the frontend, 
+    # we might need to rely on the SDK's auto-conversion or manage the chat session manually.
+    
+    # For simplicity in this migration, let's create a chat session.
+    # Note: 'history' handling depends on what the frontend sends. 
+    # If it sends a list of {"role": ..., "parts": ...}, we can pass it.
+    
+    chat = client.chats.create(
+        model=CHAT_MODEL_NAME,
+        config=types.GenerateContentConfig(
+            tools=tools,
+            system_instruction=SYSTEM_INSTRUCTION
         ),
         history=history
     )
@@ -161,3 +180,27 @@ def get_chat_response(message: str, history: list = []):
     response = chat.send_message(message)
     
     return response.text
+
+# Chat model used by get_chat_response. Swappable so the API can run against a
+# local fake (e.g. load_test.py) without calling Gemini.
+chat_model = gemini_chat_model
+
+def set_chat_model(model):
+    global chat_model
+    chat_model = model
+
+# Versi prompt: berubah otomatis jika system prompt, model, atau tools diubah.
+PROMPT_VERSION = hashlib.sha256(
+    f"{CHAT_MODEL_NAME}\0{SYSTEM_INSTRUCTION}\0{calculate_crop_recommendation.__doc__}\0{get_available_crops.__doc__}".encode("utf-8")
+).hexdigest()[:16]
+
+def get_chat_response(message: str, history: list = []):
+    if not chat_cache.enabled:
+        return chat_model(message, history)
+    # Jawaban bisa menyebut isi katalog, jadi versi katalog ikut menjadi bagian kunci cache.
+    try:
+        catalog_version = catalog.version(get_supabase_client())
+    except Exception:
+        catalog_version = 0
+    version = f"{PROMPT_VERSION}:{catalog_version}"
+    return chat_cache.get_or_compute(message, history, version, lambda: chat_model(message, history))
@@ -0,0 +1,144 @@
+import io
+import csv
+import json
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional
+from app.models import Histogram, HistogramBucket, SoilCount, TimeBucket, AnalyticsSummary
+
+# Lebar bucket histogram per metrik. HARUS sama dengan fungsi track_user_input() di schema.sql,
+# karena agregat dihitung oleh trigger database saat baris user_inputs disisipkan.
+HISTOGRAM_BUCKETS = {"ph": 0.5, "rain": 250.0, "temp": 2.0}
+
+EXPORT_COLUMNS = ["id", "user_id", "ph_value", "rain_value", "temp_value", "sun_value",
+                  "irrigation_value", "soil_type", "created_at"]
+
+# Ukuran halaman untuk membaca tabel agregat dan ekspor (batas baris select Supabase).
+PAGE_SIZE = 1000
+
+
+def _fetch_all(query_factory) -> List[dict]:
+    # Membaca seluruh hasil query per halaman (offset kecil: tabel agregat berukuran kecil).
+    rows = []
+    start = 0
+    while True:
+        data = query_factory().range(start, start + PAGE_SIZE - 1).execute().data
+        rows.extend(data)
+        if len(data) < PAGE_SIZE:
+            return rows
+        start += PAGE_SIZE
+
+
+def _sum_shards(rows: List[dict], key: str) -> Dict[object, int]:
+    # Setiap counter tersebar di beberapa baris shard (lihat track_user_input di schema.sql).
+    totals: Dict[object, int] = {}
+    for row in rows:
+        totals[row[key]] = totals.get(row[key], 0) + row['count']
+    return totals
+
+
+def get_histogram(supabase, metric: str) -> Histogram:
+    """
+    Histogram nilai ph/rain/temp dari tabel agregat user_input_histograms.
+    """
+    width = HISTOGRAM_BUCKETS[metric]
+    rows = _fetch_all(lambda: supabase.table('user_input_histograms')
+                      .select("bucket,count").eq('metric', metric).order('bucket').order('shard'))
+    return Histogram(
+        metric=metric,
+        bucket_width=width,
+        buckets=[
+            HistogramBucket(bucket_start=bucket, bucket_end=bucket + width, count=count)
+            for bucket, count in sorted(_sum_shards(rows, 'bucket').items())
+        ]
+    )
+
+
+def get_soil_distribution(supabase) -> List[SoilCount]:
+    rows = _fetch_all(lambda: supabase.table('user_input_soil_counts')
+                      .select("soil_type,count").order('soil_type').order('shard'))
+    totals = _sum_shards(rows, 'soil_type')
+    return [SoilCount(soil_type=soil_type, count=count)
+            for soil_type, count in sorted(totals.items(), key=lambda item: item[1], reverse=True)]
+
+
+def get_time_counts(supabase, interval: str = "day", since: Optional[datetime] = None,
+                    until: Optional[datetime] = None) -> List[TimeBucket]:
+    """
+    Jumlah input per jam/hari/minggu. Database menyimpan bucket per jam;
+    bucket hari dan minggu dijumlahkan dari bucket jam tersebut.
+    """
+    def query():
+        q = supabase.table('user_input_hourly_counts').select("bucket,count").order('bucket').order('shard')
+        if since:
+            q = q.gte('bucket', since.isoformat())
+        if until:
+            q = q.lt('bucket', until.isoformat())
+        return q
+
+    totals: Dict[datetime, int] = {}
+    for row in _fetch_all(query):
+        bucket = datetime.fromisoformat(row['bucket'])
+        if interval == "day":
+            bucket = bucket.replace(hour=0, minute=0, second=0, microsecond=0)
+        elif interval == "week":
+            bucket = (bucket - timedelta(days=bucket.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
+        totals[bucket] = totals.get(bucket, 0) + row['count']
+    return [TimeBucket(bucket=bucket, count=count) for bucket, count in sorted(totals.items())]
+
+
+def get_summary(supabase, interval: str = "day") -> AnalyticsSummary:
+    soil_types = get_soil_distribution(supabase)
+    return AnalyticsSummary(
+        total=sum(s.count for s in soil_types),
+        histograms=[get_histogram(supabase, metric) for metric in HISTOGRAM_BUCKETS],
+        soil_types=soil_types,
+        counts=get_time_counts(supabase, interval)
+    )
+
+
+def iter_user_inputs(supabase, since: Optional[datetime] = None, page_size: int = PAGE_SIZE) -> Iterator[dict]:
+    """
+    Membaca user_inputs berurutan (created_at, id) dengan keyset pagination:
+    setiap halaman dimulai setelah baris terakhir halaman sebelumnya, bukan dengan OFFSET,
+    sehingga biaya per halaman tetap walaupun tabel sangat besar.
+    """
+    cursor = None
+    while True:
+        query = (supabase.table('user_inputs').select(",".join(EXPORT_COLUMNS))
+                 .order('created_at').order('id').limit(page_size))
+        if cursor:
+            created_at, row_id = cursor
+            query = query.or_(f'created_at.gt."{created_at}",and(created_at.eq."{created_at}",id.gt.{row_id})')
+        elif since:
+            query = query.gte('created_at', since.isoformat())
+
+        rows = query.execute().data
+        yield from rows
+        if len(rows) < page_size:
+            return
+        cursor = (rows[-1]['created_at'], rows[-1]['id'])
+
+
+def export_ndjson(rows: Iterator[dict]) -> Iterator[str]:
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(row, default=str))
+        if len(lines) >= PAGE_SIZE:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+def export_csv(rows: Iterator[dict]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS, extrasaction='ignore')
+    writer.writeheader()
+    for i, row in enumerate(rows, 1):
+        writer.writerow(row)
+        # Kirim per ~PAGE_SIZE baris agar respons tetap streaming dengan memori kecil.
+        if i % PAGE_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
@@ -0,0 +1,112 @@
+import json
+import random
+import threading
+from typing import Dict, List, Optional, Tuple
+from app.ahp import AHPCalculator, LEVEL_MAP, LEVEL_TOLERANCE, crop_arrays
+from app.mapping import QUESTIONS_DATA, DEFAULT_VALUES, SOIL_REVERSE_MAP, map_answers_to_values
+from app.models import Crop
+from app.soil import soil_compatibility
+from app.static_assets import StaticAsset
+
+# Naikkan jika struktur bundle berubah (static/ranking.js menolak format yang tidak dikenalnya).
+BUNDLE_FORMAT = 1
+
+# Jumlah peringkat teratas yang disimpan per test vector.
+TEST_VECTOR_TOP_N = 10
+
+# Jumlah test vector acak (seed tetap, agar isi bundle dan ETag-nya deterministik).
+RANDOM_TEST_VECTORS = 8
+
+# Kolom katalog yang dikirim ke browser, sama dengan kolom di crop_arrays.
+RANGE_COLUMNS = ["ph_min", "ph_max", "rain_min", "rain_max", "temp_min", "temp_max"]
+
+
+def test_vector_answers() -> List[List[Dict[str, str]]]:
+    """
+    Kumpulan jawaban untuk test vector: tanpa jawaban (nilai default), semua opsi A/B/C,
+    kasus pembulatan tanah (rata-rata 1.5 dan 2.5), lalu kombinasi acak dengan sebagian
+    pertanyaan dilewati.
+    """
+    vectors = [[]]
+    for code in ("A", "B", "C"):
+        vectors.append([{"question_id": q["id"], "selected_option": code} for q in QUESTIONS_DATA])
+    # Python membulatkan .5 ke genap (round half to even); klien harus melakukan hal yang sama.
+    vectors.append([{"question_id": "q_soil_1", "selected_option": "A"}, {"question_id": "q_soil_2", "selected_option": "B"}])
+    vectors.append([{"question_id": "q_soil_1", "selected_option": "B"}, {"question_id": "q_soil_2", "selected_option": "C"}])
+
+    rng = random.Random(0)
+    for _ in range(RANDOM_TEST_VECTORS):
+        vectors.append([
+            {"question_id": q["id"], "selected_option": rng.choice(list(q["values"]))}
+            for q in QUESTIONS_DATA if rng.random() < 0.8
+        ])
+    return vectors
+
+
+def build_catalog_bundle(ahp_calculator: AHPCalculator, crops: List[Crop], version: int) -> dict:
+    """
+    Bundle katalog ringkas untuk perangkingan di browser (static/ranking.js): rentang
+    tanaman dalam format kolom, level sinar/irigasi, kode dan tabel kecocokan tanah,
+    bobot AHP, tabel nilai kuesioner, serta test vector hasil rank_crops di server.
+    Server tetap sumber kebenaran: klien hanya memakai bundle jika semua test vector cocok.
+    """
+    arrays = crop_arrays(crops)
+
+    # Kode dibaca sebelum tabel: kode baru selalu didaftarkan setelah tabelnya diperbesar.
+    soil_codes = dict(soil_compatibility.codes)
+    soil_matrix = soil_compatibility.matrix
+
+    columns = {"name": [c.name for c in crops]}
+    for column in RANGE_COLUMNS + ["sun", "irrigation"]:
+        columns[column] = arrays[column].tolist()
+    columns["soil"] = arrays["soil_code"].tolist()
+
+    test_vectors = []
+    for answers in test_vector_answers():
+        values = map_answers_to_values(answers)
+        recommendations = ahp_calculator.rank_crops(values, crops)[:TEST_VECTOR_TOP_N]
+        test_vectors.append({
+            "answers": answers,
+            "values": values,
+            "ranking": [[r.crop_name, r.score] for r in recommendations],
+        })
+
+    return {
+        "format": BUNDLE_FORMAT,
+        "version": version,
+        "method": "ahp",
+        "criteria": ahp_calculator.criteria,
+        "weights": [float(ahp_calculator.weights[c]) for c in ahp_calculator.criteria],
+        "levels": LEVEL_MAP,
+        "level_tolerance": LEVEL_TOLERANCE,
+        "soil": {"codes": soil_codes, "matrix": soil_matrix.tolist()},
+        "questions": {q["id"]: {"category": q["category"], "values": q["values"]} for q in QUESTIONS_DATA},
+        "defaults": DEFAULT_VALUES,
+        "soil_reverse": {str(k): v for k, v in SOIL_REVERSE_MAP.items()},
+        "crops": columns,
+        "test_vectors": test_vectors,
+    }
+
+
+class CatalogBundleCache:
+    """
+    Bundle dibangun sekali per katalog (list katalog yang sama dari CatalogCache) dan
+    disimpan sebagai StaticAsset: varian gzip/brotli dan ETag berbasis hash isi.
+    """
+    def __init__(self):
+        self._key: Tuple[Optional[List[Crop]], Optional[int]] = (None, None)
+        self._asset: Optional[StaticAsset] = None
+        self._lock = threading.Lock()
+
+    def get(self, ahp_calculator: AHPCalculator, crops: List[Crop], version: int) -> StaticAsset:
+        with self._lock:
+            cached_crops, cached_version = self._key
+            if self._asset is None or cached_crops is not crops or cached_version != version:
+                bundle = build_catalog_bundle(ahp_calculator, crops, version)
+                body = json.dumps(bundle, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+                self._asset = StaticAsset(body, "application/json")
+                self._key = (crops, version)
+            return self._asset
+
+
+catalog_bundle = CatalogBundleCache()
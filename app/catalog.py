@@ -0,0 +1,82 @@
+import os
+import time
+import threading
+from typing import List, Optional
+from app.models import Crop
+from app.ahp import crop_arrays
+
+# Supabase membatasi jumlah baris per select, jadi katalog diambil per halaman.
+PAGE_SIZE = 1000
+
+
+class CatalogCache:
+    """
+    Cache katalog tanaman di memori, diikat ke versi katalog (tabel catalog_meta).
+    Versi dicek ulang paling sering setiap ttl_seconds; jika versinya naik
+    (misalnya setelah bulk import), katalog diambil ulang dari database.
+    """
+    def __init__(self, ttl_seconds: float = 30.0):
+        self.ttl_seconds = ttl_seconds
+        self._version: Optional[int] = None
+        self._version_checked = 0.0
+        self._crops: Optional[List[Crop]] = None
+        self._crops_version: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def version(self, supabase) -> int:
+        """
+        Versi katalog saat ini. Jika tabel catalog_meta belum ada, versi dianggap 0.
+        """
+        now = time.monotonic()
+        if self._version is not None and now - self._version_checked < self.ttl_seconds:
+            return self._version
+        try:
+            response = supabase.table('catalog_meta').select("version").eq('key', 'crops').execute()
+            version = int(response.data[0]['version']) if response.data else 0
+        except Exception as e:
+            print(f"Warning: Failed to read catalog version: {e}")
+            version = self._version or 0
+        self._version, self._version_checked = version, now
+        return version
+
+    def get_crops(self, supabase) -> List[Crop]:
+        version = self.version(supabase)
+        with self._lock:
+            if self._crops is None or self._crops_version != version:
+                self._crops = fetch_crops(supabase)
+                self._crops_version = version
+                # Siapkan array skor (termasuk kode jenis tanah) sekali saat katalog dimuat.
+                crop_arrays(self._crops)
+            return self._crops
+
+    def invalidate(self):
+        with self._lock:
+            self._version = None
+            self._crops = None
+
+
+def fetch_crops(supabase) -> List[Crop]:
+    """
+    Mengambil seluruh baris tabel crops, halaman demi halaman.
+    """
+    crops = []
+    start = 0
+    while True:
+        response = supabase.table('crops').select("*").order('id').range(start, start + PAGE_SIZE - 1).execute()
+        crops.extend(Crop(**item) for item in response.data)
+        if len(response.data) < PAGE_SIZE:
+            return crops
+        start += PAGE_SIZE
+
+
+def bump_catalog_version(supabase) -> int:
+    """
+    Menaikkan versi katalog (fungsi SQL bump_catalog_version di schema.sql)
+    agar cache katalog dan snapshot sesi di setiap instance dimuat ulang.
+    """
+    response = supabase.rpc('bump_catalog_version').execute()
+    catalog.invalidate()
+    return int(response.data)
+
+
+catalog = CatalogCache(ttl_seconds=float(os.environ.get("CATALOG_VERSION_TTL", "30")))
@@ -0,0 +1,140 @@
+import os
+import re
+import time
+import json
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Callable, Optional
+from app.models import ChatCacheStats
+
+# Giliran yang menyebut kondisi lahan/lokasi pengguna sendiri dianggap personal:
+# angka (ukuran, suhu, nomor), atau milik pengguna ("lahan saya", "sawahku", ...).
+PERSONAL_PATTERN = re.compile(
+    r"\d|\b(lahan|tanah|kebun|sawah|ladang|desa|daerah|kampung|rumah)\s*(saya|ku|kami|aku)\b"
+)
+
+# Tanda baca di akhir/awal pesan tidak mengubah makna ("tanaman apa saja?" == "Tanaman apa saja").
+PUNCTUATION = re.compile(r"[^\w\s]")
+
+
+def normalize_message(message: str) -> str:
+    """
+    Bentuk kanonik pesan untuk kunci cache: huruf kecil, tanpa tanda baca,
+    spasi diringkas.
+    """
+    text = unicodedata.normalize("NFKC", message).casefold()
+    text = PUNCTUATION.sub(" ", text)
+    return " ".join(text.split())
+
+
+def is_personal(message: str, history: list) -> bool:
+    # Hanya pesan dari user yang diperiksa; balasan model boleh menyebut angka.
+    texts = [message] + [
+        str(part) for turn in history if turn.get("role") == "user" for part in turn.get("parts", [])
+    ]
+    return any(PERSONAL_PATTERN.search(normalize_message(text)) for text in texts)
+
+
+class ChatResponseCache:
+    """
+    Cache jawaban chat (LRU + TTL) untuk pesan pembuka dan percakapan pendek.
+    Kunci = pesan yang dinormalisasi + hash riwayat + versi prompt/katalog,
+    sehingga jawaban lama otomatis tidak terpakai setelah prompt atau katalog berubah.
+    """
+    def __init__(self, enabled: bool = False, max_entries: int = 1000, ttl_seconds: float = 3600,
+                 max_history: int = 2, exclude_personal: bool = True):
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_history = max_history
+        self.exclude_personal = exclude_personal
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+
+    def key(self, message: str, history: list, version: str) -> str:
+        normalized_history = [
+            {"role": turn.get("role"), "parts": [normalize_message(str(p)) for p in turn.get("parts", [])]}
+            for turn in history
+        ]
+        history_hash = hashlib.sha256(json.dumps(normalized_history, sort_keys=True).encode("utf-8")).hexdigest()
+        return hashlib.sha256(f"{version}\0{history_hash}\0{normalize_message(message)}".encode("utf-8")).hexdigest()
+
+    def cacheable(self, message: str, history: list) -> bool:
+        if len(history) > self.max_history:
+            return False
+        return not (self.exclude_personal and is_personal(message, history))
+
+    def get_or_compute(self, message: str, history: list, version: str, compute: Callable[[], str]) -> str:
+        if not self.enabled:
+            return compute()
+        if not self.cacheable(message, history):
+            with self._lock:
+                self.bypassed += 1
+            return compute()
+
+        key = self.key(message, history, version)
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+
+        response = compute()
+        # Pesan error (mis. API key tidak ada) tidak disimpan.
+        if isinstance(response, str) and not response.startswith("Error"):
+            self.put(key, response)
+        return response
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[1] > self.ttl_seconds:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key: str, response: str):
+        with self._lock:
+            self._entries[key] = (response, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.bypassed = 0
+
+    def stats(self) -> ChatCacheStats:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return ChatCacheStats(
+                enabled=self.enabled,
+                entries=len(self._entries),
+                hits=self.hits,
+                misses=self.misses,
+                bypassed=self.bypassed,
+                hit_ratio=self.hits / lookups if lookups else 0.0
+            )
+
+
+def _env_flag(name: str, default: str) -> bool:
+    return os.environ.get(name, default).strip().lower() in ("1", "true", "yes", "on")
+
+
+# Opt-in: aktif hanya jika CHAT_CACHE_ENABLED=1.
+chat_cache = ChatResponseCache(
+    enabled=_env_flag("CHAT_CACHE_ENABLED", "0"),
+    max_entries=int(os.environ.get("CHAT_CACHE_SIZE", "1000")),
+    ttl_seconds=float(os.environ.get("CHAT_CACHE_TTL", "3600")),
+    max_history=int(os.environ.get("CHAT_CACHE_MAX_HISTORY", "2")),
+    exclude_personal=_env_flag("CHAT_CACHE_EXCLUDE_PERSONAL", "1"),
+)
@@ -0,0 +1,281 @@
+"""
+Data iklim regional (curah hujan tahunan, suhu rata-rata) dari grid lokal.
+
+Dataset dibangun sekali dari CSV (kolom lat, lon, rain, temp):
+    python -m app.climate data/iklim.csv data/climate_grid --cell-size 0.25
+
+Hasilnya folder berisi points.npy (titik terurut per sel grid), keys.npy
+(kunci sel terurut) dan grid.json. Saat runtime folder ini dibuka dengan
+memory mapping (CLIMATE_GRID_PATH), jadi dataset besar tidak dimuat ke RAM.
+"""
+import os
+import csv
+import json
+import math
+import argparse
+import threading
+import numpy as np
+from typing import Dict, List, Optional
+from app.models import ClimateRecord
+from app.mapping import QUESTIONS_DATA
+
+# Panjang 1 derajat lintang dalam km.
+KM_PER_DEGREE = 111.195
+
+# Bobot nilai terukur saat dicampur dengan jawaban kuesioner (0 = abaikan grid, 1 = pakai grid saja).
+DEFAULT_BLEND_WEIGHT = 0.5
+
+# Titik grid terdekat lebih jauh dari ini dianggap tidak mewakili lokasi pengguna.
+DEFAULT_MAX_DISTANCE_KM = 50.0
+
+# Kategori yang bisa diisi dari grid iklim.
+CLIMATE_CATEGORIES = ("rain", "temp")
+
+
+class ClimateGrid:
+    """
+    Indeks grid di atas titik-titik iklim. Titik diurutkan berdasarkan kunci sel
+    (baris * jumlah kolom + kolom); pencarian sel memakai searchsorted (O(log n)),
+    lalu titik terdekat dicari di sel sekitar, melebar cincin demi cincin.
+    """
+    def __init__(self, points: np.ndarray, keys: np.ndarray, cell_size: float, lat_min: float,
+                 lon_min: float, n_rows: int, n_cols: int):
+        self.points = points
+        self.keys = keys
+        self.cell_size = cell_size
+        self.lat_min = lat_min
+        self.lon_min = lon_min
+        self.n_rows = n_rows
+        self.n_cols = n_cols
+
+    @classmethod
+    def open(cls, directory: str) -> "ClimateGrid":
+        with open(os.path.join(directory, "grid.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        points = np.load(os.path.join(directory, "points.npy"), mmap_mode="r")
+        keys = np.load(os.path.join(directory, "keys.npy"), mmap_mode="r")
+        return cls(points, keys, meta["cell_size"], meta["lat_min"], meta["lon_min"], meta["n_rows"], meta["n_cols"])
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def _cell(self, lat: float, lon: float):
+        return (int(math.floor((lat - self.lat_min) / self.cell_size)),
+                int(math.floor((lon - self.lon_min) / self.cell_size)))
+
+    def _segments(self, row: int, col_from: int, col_to: int) -> List[tuple]:
+        # Rentang kunci [awal, akhir) untuk sel row x [col_from, col_to], dipotong ke batas grid.
+        col_from, col_to = max(col_from, 0), min(col_to, self.n_cols - 1)
+        if not 0 <= row < self.n_rows or col_from > col_to:
+            return []
+        return [(row * self.n_cols + col_from, row * self.n_cols + col_to + 1)]
+
+    def _ring(self, row: int, col: int, rows: int, cols: int, inner_rows: int, inner_cols: int) -> List[tuple]:
+        # Rentang kunci sel di dalam persegi (rows x cols sel dari (row, col)) tetapi di luar
+        # persegi dalam (inner_rows x inner_cols; -1 = kosong). Kunci satu baris grid berurutan,
+        # jadi setiap baris cukup satu atau dua rentang, berapa pun lebar cincinnya.
+        segments = []
+        for r in range(max(row - rows, 0), min(row + rows, self.n_rows - 1) + 1):
+            if abs(r - row) > inner_rows:
+                segments += self._segments(r, col - cols, col + cols)
+            else:
+                segments += self._segments(r, col - cols, col - inner_cols - 1)
+                segments += self._segments(r, col + inner_cols + 1, col + cols)
+        return segments
+
+    def _box_distance(self, lat: float, lon: float, cos_lat: float) -> float:
+        # Jarak minimum (metrik yang sama dengan nearest) dari (lat, lon) ke kotak batas grid.
+        lat_max = self.lat_min + self.n_rows * self.cell_size
+        lon_max = self.lon_min + self.n_cols * self.cell_size
+        dy = max(self.lat_min - lat, 0.0, lat - lat_max) * KM_PER_DEGREE
+        dx = max(self.lon_min - lon, 0.0, lon - lon_max) * KM_PER_DEGREE * cos_lat
+        return math.hypot(dx, dy)
+
+    def nearest(self, lat: float, lon: float, max_distance_km: float = DEFAULT_MAX_DISTANCE_KM) -> Optional[ClimateRecord]:
+        """
+        Titik grid terdekat dari (lat, lon) dalam radius max_distance_km, atau None.
+        """
+        if len(self) == 0:
+            return None
+        cos_lat = math.cos(math.radians(lat))
+        # Lokasi jauh di luar grid (mis. dekat kutub untuk grid Indonesia) tidak perlu dicari.
+        if self._box_distance(lat, lon, cos_lat) > max_distance_km:
+            return None
+        row, col = self._cell(lat, lon)
+        best_index, best_distance = -1, math.inf
+
+        # Cincin melebar satu sel lintang setiap langkah. Satu derajat bujur menyempit ke arah
+        # kutub, jadi lebar cincin dalam kolom diskalakan 1/cos(lat) (dibatasi lebar grid):
+        # jumlah cincin hanya bergantung pada max_distance_km / ukuran sel, bukan pada lintang.
+        row_km = self.cell_size * KM_PER_DEGREE
+        col_ratio = 1.0 / max(cos_lat, 1e-9)
+        max_cols = max(col, self.n_cols - 1 - col)
+        rows, cols = -1, -1
+        radius = 0
+        while True:
+            # Semua titik di luar persegi sebelumnya berjarak minimal (radius - 1) sel lintang.
+            bound = max(radius - 1, 0) * row_km
+            if best_distance <= bound or max_distance_km < bound:
+                break
+            inner_rows, inner_cols = rows, cols
+            rows = radius
+            cols = min(int(math.ceil(radius * col_ratio)), max_cols)
+            radius += 1
+            segments = self._ring(row, col, rows, cols, inner_rows, inner_cols)
+            if not segments:
+                continue
+            bounds = np.searchsorted(self.keys, np.array(segments, dtype=np.int64).ravel(), side="left").reshape(-1, 2)
+            indices = np.concatenate([np.arange(s, e) for s, e in bounds if e > s] or [np.empty(0, dtype=np.int64)])
+            if len(indices) == 0:
+                continue
+
+            candidates = np.asarray(self.points[indices], dtype=float)
+            # Jarak equirectangular; cukup akurat untuk radius puluhan km.
+            dy = (candidates[:, 0] - lat) * KM_PER_DEGREE
+            dx = (candidates[:, 1] - lon) * KM_PER_DEGREE * cos_lat
+            distances = np.hypot(dx, dy)
+            i = int(np.argmin(distances))
+            if distances[i] < best_distance:
+                best_index, best_distance = int(indices[i]), float(distances[i])
+
+        if best_index < 0 or best_distance > max_distance_km:
+            return None
+        point = self.points[best_index]
+        # Titik disimpan sebagai float32; dibulatkan agar tidak muncul angka seperti -6.900000095.
+        return ClimateRecord(lat=round(float(point[0]), 5), lon=round(float(point[1]), 5),
+                             rain=round(float(point[2]), 2), temp=round(float(point[3]), 2),
+                             distance_km=round(best_distance, 2))
+
+
+def build_climate_grid(points: np.ndarray, directory: str, cell_size: float = 0.25):
+    """
+    Menyimpan titik (n x 4: lat, lon, rain, temp) terurut per sel grid, siap di-memory-map.
+    """
+    points = np.asarray(points, dtype=np.float32)
+    points = points[np.isfinite(points).all(axis=1)]
+    lat_min = float(math.floor(points[:, 0].min() / cell_size) * cell_size) if len(points) else 0.0
+    lon_min = float(math.floor(points[:, 1].min() / cell_size) * cell_size) if len(points) else 0.0
+    rows = np.floor((points[:, 0] - lat_min) / cell_size).astype(np.int64)
+    cols = np.floor((points[:, 1] - lon_min) / cell_size).astype(np.int64)
+    n_rows = int(rows.max()) + 1 if len(points) else 0
+    n_cols = int(cols.max()) + 1 if len(points) else 0
+
+    keys = rows * n_cols + cols
+    order = np.argsort(keys, kind="stable")
+
+    os.makedirs(directory, exist_ok=True)
+    np.save(os.path.join(directory, "points.npy"), points[order])
+    np.save(os.path.join(directory, "keys.npy"), keys[order])
+    with open(os.path.join(directory, "grid.json"), "w", encoding="utf-8") as f:
+        json.dump({"cell_size": cell_size, "lat_min": lat_min, "lon_min": lon_min,
+                   "n_rows": n_rows, "n_cols": n_cols, "points": int(len(points))}, f)
+
+
+def read_points_csv(path: str, chunk_size: int = 100_000) -> np.ndarray:
+    """
+    Membaca CSV (lat, lon, rain, temp) per potongan ke array float32.
+    """
+    chunks, chunk = [], []
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            chunk.append((row["lat"], row["lon"], row["rain"], row["temp"]))
+            if len(chunk) >= chunk_size:
+                chunks.append(np.asarray(chunk, dtype=np.float32))
+                chunk = []
+    if chunk:
+        chunks.append(np.asarray(chunk, dtype=np.float32))
+    return np.concatenate(chunks) if chunks else np.empty((0, 4), dtype=np.float32)
+
+
+def answered_categories(answers: List[Dict[str, str]]) -> set:
+    q_map = {q['id']: q for q in QUESTIONS_DATA}
+    return {
+        q_map[a.get('question_id')]['category'] for a in answers
+        if a.get('question_id') in q_map and a.get('selected_option') in q_map[a.get('question_id')]['values']
+    }
+
+
+def blend_climate(values: Dict[str, any], record: Optional[ClimateRecord], answered: set,
+                  weight: float = DEFAULT_BLEND_WEIGHT) -> Dict[str, any]:
+    """
+    Mencampur nilai teknis dengan data iklim terukur. Kategori yang dilewati memakai
+    nilai terukur; kategori yang dijawab dirata-rata tertimbang dengan nilai terukur.
+    """
+    if record is None:
+        return values
+    blended = dict(values)
+    for category in CLIMATE_CATEGORIES:
+        blended[category] = blend_value(category, values[category], record, category in answered, weight)
+    return blended
+
+
+def blend_value(category: str, value: float, record: ClimateRecord, answered: bool,
+                weight: float = DEFAULT_BLEND_WEIGHT) -> float:
+    measured = getattr(record, category)
+    if not answered:
+        return measured
+    return (1 - weight) * value + weight * measured
+
+
+class ClimateService:
+    """
+    Membuka grid di CLIMATE_GRID_PATH saat pertama kali dibutuhkan.
+    Tanpa dataset, lookup mengembalikan None dan nilai kuesioner dipakai apa adanya.
+    """
+    def __init__(self, path: Optional[str], max_distance_km: float, blend_weight: float):
+        self.path = path
+        self.max_distance_km = max_distance_km
+        self.blend_weight = blend_weight
+        self._grid: Optional[ClimateGrid] = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def grid(self) -> Optional[ClimateGrid]:
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    if self.path:
+                        try:
+                            self._grid = ClimateGrid.open(self.path)
+                        except Exception as e:
+                            print(f"Warning: Failed to open climate grid at {self.path}: {e}")
+                    self._loaded = True
+        return self._grid
+
+    def lookup(self, lat: Optional[float], lon: Optional[float]) -> Optional[ClimateRecord]:
+        if lat is None or lon is None:
+            return None
+        grid = self.grid()
+        if grid is None:
+            return None
+        return grid.nearest(lat, lon, self.max_distance_km)
+
+    def apply(self, values: Dict[str, any], answers: List[Dict[str, str]],
+              record: Optional[ClimateRecord]) -> Dict[str, any]:
+        return blend_climate(values, record, answered_categories(answers), self.blend_weight)
+
+
+climate = ClimateService(
+    path=os.environ.get("CLIMATE_GRID_PATH"),
+    max_distance_km=float(os.environ.get("CLIMATE_MAX_DISTANCE_KM", DEFAULT_MAX_DISTANCE_KM)),
+    blend_weight=float(os.environ.get("CLIMATE_BLEND_WEIGHT", DEFAULT_BLEND_WEIGHT)),
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a memory-mappable climate grid from CSV or .npy.")
+    parser.add_argument("source", help="CSV with columns lat,lon,rain,temp or .npy array (n x 4)")
+    parser.add_argument("output", help="Output directory (use it as CLIMATE_GRID_PATH)")
+    parser.add_argument("--cell-size", type=float, default=0.25, help="Grid cell size in degrees")
+    args = parser.parse_args()
+
+    if args.source.lower().endswith(".npy"):
+        points = np.load(args.source, mmap_mode="r")
+    else:
+        points = read_points_csv(args.source)
+    build_climate_grid(points, args.output, args.cell_size)
+    print(f"Wrote {len(points)} points to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
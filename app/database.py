@@ -6,6 +6,8 @@ load_dotenv()
 
 url: str = os.environ.get("SUPABASE_URL")
 key: str = os.environ.get("SUPABASE_KEY")
+# Service role key for admin-only tables (analytics aggregates are closed to the anon key by RLS)
+service_key: str = os.environ.get("SUPABASE_SERVICE_KEY")
 
 if not url or not key:
     print("Warning: SUPABASE_URL or SUPABASE_KEY not found in environment variables.")
@@ -16,3 +18,10 @@ def get_supabase_client() -> Client:
     if not url or not key:
         raise ValueError("Supabase credentials are missing. Please check your .env file.")
     return create_client(url, key)
+
+def get_supabase_admin_client() -> Client:
+    # Falls back to SUPABASE_KEY, which works only if that is already the service role key
+    admin_key = service_key or key
+    if not url or not admin_key:
+        raise ValueError("Supabase credentials are missing. Please check your .env file.")
+    return create_client(url, admin_key)
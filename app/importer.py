@@ -0,0 +1,207 @@
+"""
+Bulk import katalog tanaman dari CSV atau Parquet.
+
+Contoh:
+    python -m app.importer data/varietas.csv --batch-size 1000
+    python -m app.importer data/varietas.parquet --dry-run
+"""
+import csv
+import argparse
+import numpy as np
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from app.models import ImportReport, ImportRowError
+from app.catalog import bump_catalog_version
+
+NUMERIC_COLUMNS = ["ph_min", "ph_max", "rain_min", "rain_max", "temp_min", "temp_max"]
+TEXT_COLUMNS = ["name", "sun_requirement", "soil_type", "irrigation_need", "description"]
+# Kolom opsional: hanya di-upsert jika ada di file (nilai yang sudah ada di database tidak ditimpa).
+# Sel kosong = nilai default (lihat DEFAULT_SEASON_MONTHS di app/ahp.py).
+OPTIONAL_COLUMNS = ["season_months"]
+LEVELS = ["Low", "Medium", "High"]
+
+# Batas nilai yang masuk akal per kriteria (min, max).
+VALID_RANGES = {
+    "ph": (0.0, 14.0),
+    "rain": (0.0, 20000.0),
+    "temp": (-20.0, 60.0),
+}
+
+# Jumlah maksimum error baris yang disimpan di laporan.
+MAX_REPORTED_ERRORS = 100
+
+
+def iter_csv_chunks(path: str, chunk_size: int) -> Iterator[Dict[str, list]]:
+    """
+    Membaca CSV secara streaming dan menghasilkan potongan berbentuk kolom.
+    """
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        chunk = []
+        for row in reader:
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                yield _to_columns(chunk)
+                chunk = []
+        if chunk:
+            yield _to_columns(chunk)
+
+
+def iter_parquet_chunks(path: str, chunk_size: int) -> Iterator[Dict[str, list]]:
+    """
+    Membaca Parquet per record batch (butuh pyarrow) dan menghasilkan potongan berbentuk kolom.
+    """
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet import requires pyarrow. Install it with: pip install pyarrow")
+
+    parquet_file = pq.ParquetFile(path)
+    columns = [c for c in NUMERIC_COLUMNS + TEXT_COLUMNS + OPTIONAL_COLUMNS if c in parquet_file.schema_arrow.names]
+    for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=columns):
+        yield batch.to_pydict()
+
+
+def _to_columns(rows: List[Dict[str, str]]) -> Dict[str, list]:
+    present = NUMERIC_COLUMNS + TEXT_COLUMNS + [c for c in OPTIONAL_COLUMNS if c in rows[0]]
+    return {c: [row.get(c) for row in rows] for c in present}
+
+
+def _float_column(values: list) -> np.ndarray:
+    # Jalur cepat: seluruh nilai valid. Jika tidak, nilai yang gagal diparse menjadi NaN.
+    try:
+        return np.asarray(values, dtype=float)
+    except (TypeError, ValueError):
+        parsed = np.full(len(values), np.nan)
+        for i, v in enumerate(values):
+            try:
+                parsed[i] = float(v)
+            except (TypeError, ValueError):
+                pass
+        return parsed
+
+
+def _text_column(values: list) -> np.ndarray:
+    return np.array(["" if v is None else str(v).strip() for v in values], dtype=object)
+
+
+def validate_chunk(columns: Dict[str, list], row_offset: int = 0) -> Tuple[List[dict], List[ImportRowError], int]:
+    """
+    Validasi satu potongan secara vektor (per kolom, bukan per baris).
+    Mengembalikan baris valid (siap di-upsert), daftar error, dan jumlah baris yang ditolak.
+    """
+    n = len(next(iter(columns.values()), []))
+    numeric = {c: _float_column(columns.get(c) or [None] * n) for c in NUMERIC_COLUMNS}
+    text = {c: _text_column(columns.get(c) or [None] * n) for c in TEXT_COLUMNS}
+    # Sel kosong menjadi NaN (boleh); isi yang bukan angka dicek terpisah.
+    season_raw = _text_column(columns.get("season_months") or [None] * n)
+    season = _float_column([v or None for v in season_raw])
+
+    # Setiap aturan menghasilkan mask baris yang gagal; alasan pertama yang dilaporkan.
+    checks = [
+        (text["name"] == "", "name is empty"),
+        (text["soil_type"] == "", "soil_type is empty"),
+        (~np.isin(text["sun_requirement"], LEVELS), "sun_requirement must be Low, Medium or High"),
+        (~np.isin(text["irrigation_need"], LEVELS), "irrigation_need must be Low, Medium or High"),
+    ]
+    checks.append((
+        (season_raw != "") & ~((season >= 1) & (season <= 12) & (season == np.floor(season))),
+        "season_months must be a whole number between 1 and 12"
+    ))
+    for criterion, (low, high) in VALID_RANGES.items():
+        lo, hi = numeric[f"{criterion}_min"], numeric[f"{criterion}_max"]
+        checks.append((np.isnan(lo) | np.isnan(hi), f"{criterion}_min/{criterion}_max must be numbers"))
+        checks.append((lo > hi, f"{criterion}_min is greater than {criterion}_max"))
+        checks.append(((lo < low) | (hi > high), f"{criterion} range must be within {low} - {high}"))
+
+    invalid = np.zeros(n, dtype=bool)
+    errors = []
+    for mask, reason in checks:
+        new = mask & ~invalid
+        for i in np.flatnonzero(new)[:MAX_REPORTED_ERRORS]:
+            errors.append(ImportRowError(row=row_offset + int(i) + 1, reason=reason))
+        invalid |= mask
+
+    # Nama adalah natural key: jika duplikat dalam satu potongan, baris terakhir yang dipakai.
+    rows = {}
+    for i in np.flatnonzero(~invalid):
+        row = {c: float(numeric[c][i]) for c in NUMERIC_COLUMNS}
+        row.update({c: text[c][i] for c in TEXT_COLUMNS})
+        row["description"] = row["description"] or None
+        if "season_months" in columns:
+            row["season_months"] = None if np.isnan(season[i]) else int(season[i])
+        rows[row["name"]] = row
+    errors.sort(key=lambda e: e.row)
+    return list(rows.values()), errors, int(invalid.sum())
+
+
+def upsert_batches(supabase, rows: List[dict], batch_size: int) -> int:
+    """
+    Upsert ke tabel crops per batch besar dengan nama tanaman sebagai natural key.
+    """
+    upserted = 0
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        supabase.table('crops').upsert(batch, on_conflict='name').execute()
+        upserted += len(batch)
+    return upserted
+
+
+def import_crops(path: str, supabase=None, chunk_size: int = 5000, batch_size: int = 1000,
+                 dry_run: bool = False, progress: Optional[Callable[[ImportReport], None]] = None) -> ImportReport:
+    """
+    Pipeline import: baca per potongan -> validasi -> upsert per batch -> naikkan versi katalog.
+    Memori yang dipakai sebanding dengan chunk_size, bukan ukuran file.
+    """
+    if path.lower().endswith((".parquet", ".pq")):
+        chunks = iter_parquet_chunks(path, chunk_size)
+    else:
+        chunks = iter_csv_chunks(path, chunk_size)
+
+    if supabase is None and not dry_run:
+        # Upsert katalog dan bump_catalog_version hanya boleh dengan service key.
+        from app.database import get_supabase_admin_client
+        supabase = get_supabase_admin_client()
+
+    report = ImportReport(total_rows=0, valid_rows=0, invalid_rows=0, upserted=0, errors=[])
+    for columns in chunks:
+        rows, errors, invalid_rows = validate_chunk(columns, row_offset=report.total_rows)
+        chunk_rows = len(next(iter(columns.values()), []))
+
+        report.total_rows += chunk_rows
+        report.valid_rows += chunk_rows - invalid_rows
+        report.invalid_rows += invalid_rows
+        report.errors.extend(errors[:MAX_REPORTED_ERRORS - len(report.errors)])
+
+        if not dry_run:
+            report.upserted += upsert_batches(supabase, rows, batch_size)
+        if progress:
+            progress(report)
+
+    if report.upserted and not dry_run:
+        report.catalog_version = bump_catalog_version(supabase)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import crop catalog from CSV or Parquet.")
+    parser.add_argument("path", help="CSV or Parquet file with columns matching the crops table")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="Rows read and validated per chunk")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Rows per upsert request")
+    parser.add_argument("--dry-run", action="store_true", help="Validate only, do not write to the database")
+    args = parser.parse_args()
+
+    def print_progress(report: ImportReport):
+        print(f"Processed {report.total_rows} rows: {report.valid_rows} valid, "
+              f"{report.invalid_rows} invalid, {report.upserted} upserted")
+
+    report = import_crops(args.path, chunk_size=args.chunk_size, batch_size=args.batch_size,
+                          dry_run=args.dry_run, progress=print_progress)
+
+    for error in report.errors:
+        print(f"Row {error.row}: {error.reason}")
+    if report.catalog_version is not None:
+        print(f"Catalog version bumped to {report.catalog_version}")
+
+
+if __name__ == "__main__":
+    main()
@@ -213,29 +213,26 @@ def map_answers_to_values(answers: List[Dict[str, str]]) -> Dict[str, any]:
                 category_values[category].append(val)
                 
     # 2. Hitung rata-rata
-    result = {}
-    
-    # Mapping balik untuk Soil (numerik -> string)
-    soil_reverse_map = {1: "Clay", 2: "Loam", 3: "Sandy"}
-    
-    for cat, vals in category_values.items():
-        if not vals:
-            # Default values jika user skip (safe defaults)
-            if cat == "soil": result[cat] = "Loam"
-            elif cat == "ph": result[cat] = 6.0
-            elif cat == "rain": result[cat] = 1500.0
-            elif cat == "temp": result[cat] = 25.0
-            else: result[cat] = 0.6
-            continue
-            
-        avg_val = statistics.mean(vals)
-        
-        if cat == "soil":
-            # Untuk soil, kita bulatkan ke integer terdekat (1, 2, atau 3) lalu kembalikan ke string
-            rounded_val = int(round(avg_val))
-            result[cat] = soil_reverse_map.get(rounded_val, "Loam")
-        else:
-            # Untuk yang lain, gunakan nilai rata-rata float
-            result[cat] = float(avg_val)
-            
-    return result
+    return {cat: category_value(cat, vals) for cat, vals in category_values.items()}
+
+# Default values jika user skip (safe defaults)
+DEFAULT_VALUES = {"ph": 6.0, "rain": 1500.0, "temp": 25.0, "sun": 0.6, "irrigation": 0.6, "soil": "Loam"}
+
+# Mapping balik untuk Soil (numerik -> string)
+SOIL_REVERSE_MAP = {1: "Clay", 2: "Loam", 3: "Sandy"}
+
+def category_value(cat: str, vals: List[Union[int, float]]) -> Union[str, float]:
+    """
+    Nilai teknis satu kategori dari nilai-nilai jawaban di kategori tersebut.
+    """
+    if not vals:
+        return DEFAULT_VALUES[cat]
+
+    avg_val = statistics.mean(vals)
+
+    if cat == "soil":
+        # Untuk soil, kita bulatkan ke integer terdekat (1, 2, atau 3) lalu kembalikan ke string
+        rounded_val = int(round(avg_val))
+        return SOIL_REVERSE_MAP.get(rounded_val, "Loam")
+    # Untuk yang lain, gunakan nilai rata-rata float
+    return float(avg_val)
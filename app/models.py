@@ -1,5 +1,6 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional, Dict
+from datetime import datetime
 
 class QuestionOption(BaseModel):
     label: str
@@ -18,6 +19,18 @@ class UserAnswer(BaseModel):
 
 class UserInputSubmission(BaseModel):
     answers: List[UserAnswer]
+    # Lokasi lahan (opsional): curah hujan dan suhu diisi dari grid iklim regional
+    lat: Optional[float] = Field(None, ge=-90, le=90)
+    lon: Optional[float] = Field(None, ge=-180, le=180)
+    # Metode agregasi skor: 'ahp' (default), 'topsis', 'fuzzy_ahp' (lihat app/scoring.py)
+    method: Optional[str] = None
+
+class ClimateRecord(BaseModel):
+    lat: float
+    lon: float
+    rain: float # curah hujan tahunan (mm)
+    temp: float # suhu rata-rata (C)
+    distance_km: float # jarak titik grid ke lokasi pengguna
 
 class MatchDetails(BaseModel):
     ph: float
@@ -34,6 +47,71 @@ class Recommendation(BaseModel):
 
 class RecommendationResponse(BaseModel):
     recommendations: List[Recommendation]
+    climate: Optional[ClimateRecord] = None
+    method: str = "ahp"
+
+class AdaptiveQuestionRequest(BaseModel):
+    answers: List[UserAnswer]
+    lat: Optional[float] = Field(None, ge=-90, le=90)
+    lon: Optional[float] = Field(None, ge=-180, le=180)
+    top_k: int = Field(3, ge=1)
+
+class AdaptiveQuestionResponse(BaseModel):
+    done: bool # True jika jawaban apa pun untuk sisa pertanyaan tidak mengubah top-k
+    questions: List[Question] # sisa pertanyaan yang masih bisa mengubah top-k
+    settled: List[str] # tanaman yang pasti masuk top-k
+    contested: int # jumlah tanaman yang masih bisa masuk atau keluar top-k
+
+class RankChange(BaseModel):
+    crop_name: str
+    rank: int
+    score: float
+    previous_rank: int
+    previous_score: float
+    match_details: MatchDetails
+
+class WhatIfSessionResponse(BaseModel):
+    session_id: str
+    recommendations: List[Recommendation]
+    climate: Optional[ClimateRecord] = None
+    method: str = "ahp"
+
+class WhatIfDiffResponse(BaseModel):
+    session_id: str
+    changed_criteria: List[str]
+    changes: List[RankChange] # hanya tanaman yang skor atau peringkatnya berubah
+
+class SensitivityRequest(BaseModel):
+    answers: List[UserAnswer]
+    samples: int = Field(1000, ge=1, le=20000)
+    spread: float = Field(0.3, gt=0, le=2.0) # sigma noise log-normal pada penilaian Saaty
+    top_k: int = Field(3, ge=1)
+    seed: Optional[int] = None
+
+class CropStability(BaseModel):
+    crop_name: str
+    baseline_rank: int
+    baseline_score: float
+    p_same_rank: float
+    p_top_k: float
+    mean_rank: float
+    rank_probabilities: List[float] # peluang berada di peringkat 1..top_k
+
+class JudgmentSweep(BaseModel):
+    criterion_a: str
+    criterion_b: str
+    baseline_value: float
+    stable_min: float
+    stable_max: float
+    top_k_changes: int
+
+class SensitivityResponse(BaseModel):
+    samples: int
+    spread: float
+    top_k: int
+    consistent_ratio: float # proporsi sampel dengan CR <= 0.10
+    crops: List[CropStability]
+    sweeps: List[JudgmentSweep]
 
 class Crop(BaseModel):
     id: str
@@ -48,3 +126,114 @@ class Crop(BaseModel):
     soil_type: str
     irrigation_need: str
     description: Optional[str] = None
+    season_months: Optional[int] = None # lama musim tanam (bulan); kosong = DEFAULT_SEASON_MONTHS
+
+class ImportRowError(BaseModel):
+    row: int # nomor baris data (1 = baris pertama setelah header)
+    reason: str
+
+class ImportReport(BaseModel):
+    total_rows: int
+    valid_rows: int
+    invalid_rows: int
+    upserted: int
+    errors: List[ImportRowError]
+    catalog_version: Optional[int] = None
+
+class HistogramBucket(BaseModel):
+    bucket_start: float
+    bucket_end: float
+    count: int
+
+class Histogram(BaseModel):
+    metric: str # 'ph', 'rain', 'temp'
+    bucket_width: float
+    buckets: List[HistogramBucket]
+
+class SoilCount(BaseModel):
+    soil_type: str
+    count: int
+
+class TimeBucket(BaseModel):
+    bucket: datetime
+    count: int
+
+class AnalyticsSummary(BaseModel):
+    total: int
+    histograms: List[Histogram]
+    soil_types: List[SoilCount]
+    counts: List[TimeBucket]
+
+class ChatCacheStats(BaseModel):
+    enabled: bool
+    entries: int
+    hits: int
+    misses: int
+    bypassed: int # giliran yang tidak boleh di-cache (riwayat panjang / personal)
+    hit_ratio: float
+
+class ProfileCapture(BaseModel):
+    id: str
+    kind: str # 'cprofile' (diminta lewat header/admin) atau 'sampled' (request lambat)
+    method: str
+    path: str
+    status: int
+    duration_ms: float
+    created_at: datetime
+    samples: Optional[int] = None # jumlah sampel stack (khusus 'sampled')
+
+class ProfileArmRequest(BaseModel):
+    count: int = Field(1, ge=1, le=100) # jumlah request berikutnya yang diprofil
+    path_prefix: str = "/api/"
+
+class TelemetryEvent(BaseModel):
+    # Satu submission yang diranking di browser (static/ranking.js)
+    answers: List[UserAnswer]
+
+class TelemetryBatch(BaseModel):
+    events: List[TelemetryEvent] = Field(..., min_length=1, max_length=50)
+
+class TelemetryResponse(BaseModel):
+    accepted: int
+
+class SeasonalRequest(BaseModel):
+    answers: List[UserAnswer]
+    # Deret iklim satu tahun mulai Januari: 12 nilai bulanan atau 52 nilai mingguan
+    rain: List[float] # curah hujan per bulan/minggu (mm)
+    temp: List[float] # suhu rata-rata per bulan/minggu (Celsius)
+    method: Optional[str] = None
+    top_k: Optional[int] = Field(None, ge=1)
+    include_windows: bool = False # sertakan skor setiap bulan/minggu tanam
+
+class SeasonalRecommendation(BaseModel):
+    crop_name: str
+    score: float # skor pada waktu tanam terbaik
+    best_month: int # 1 = Januari
+    best_start: int # indeks awal jendela di deret (bulan/minggu ke-, mulai 0)
+    season_months: int
+    match_details: MatchDetails # rincian kecocokan pada waktu tanam terbaik
+    window_scores: Optional[List[float]] = None
+
+class SeasonalResponse(BaseModel):
+    recommendations: List[SeasonalRecommendation]
+    method: str
+    steps: int # 12 (bulanan) atau 52 (mingguan)
+
+class SeasonalFarm(BaseModel):
+    id: Optional[str] = None
+    answers: List[UserAnswer]
+    rain: List[float]
+    temp: List[float]
+
+class SeasonalBatchRequest(BaseModel):
+    farms: List[SeasonalFarm] = Field(..., min_length=1, max_length=500)
+    method: Optional[str] = None
+    top_k: int = Field(5, ge=1)
+
+class SeasonalFarmResult(BaseModel):
+    id: Optional[str] = None
+    recommendations: List[SeasonalRecommendation]
+
+class SeasonalBatchResponse(BaseModel):
+    farms: List[SeasonalFarmResult]
+    method: str
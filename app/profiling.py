@@ -0,0 +1,345 @@
+"""
+Profiling request on-demand dan penangkapan request lambat.
+
+Aktif hanya jika PROFILING_ENABLED=1; jika tidak, middleware sama sekali tidak dipasang
+(nol overhead). Saat aktif:
+- Header "X-Profile: 1" + X-Admin-Token yang valid, atau request yang di-"arm" lewat
+  endpoint admin, dijalankan di bawah cProfile. ID hasilnya dikirim di header X-Profile-Id.
+- Request yang lebih lama dari PROFILE_SLOW_MS otomatis disimpan sebagai profil
+  stack-sampling (format folded, bisa dibuka di speedscope / flamegraph.pl). Hanya thread
+  event loop yang disampel, dan hanya saat request itu sendiri yang sedang berjalan.
+Hasil disimpan di PROFILE_DIR sebagai ring buffer berukuran PROFILE_MAX_CAPTURES.
+"""
+import io
+import os
+import sys
+import json
+import time
+import uuid
+import pstats
+import marshal
+import cProfile
+import threading
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+from app.admin import is_admin_token
+from app.models import ProfileCapture
+
+# Kedalaman stack maksimum yang dicatat per sampel.
+MAX_STACK_DEPTH = 64
+
+# Jumlah baris fungsi pada ringkasan teks cProfile.
+SUMMARY_LINES = 60
+
+# Semua file milik satu capture (metadata + data).
+FILE_EXTENSIONS = ("json", "prof", "txt", "folded")
+
+
+class ProfileStore:
+    """
+    Ring buffer hasil profil di disk: satu file metadata .json per capture ditambah
+    file datanya (.prof + .txt untuk cProfile, .folded untuk sampling).
+    Capture paling lama dihapus jika jumlahnya melebihi max_captures.
+    """
+    def __init__(self, directory: str, max_captures: int = 50):
+        self.directory = directory
+        self.max_captures = max_captures
+        self._lock = threading.Lock()
+
+    def new_id(self) -> str:
+        # Diawali timestamp (ms) agar urutan nama file = urutan waktu.
+        return f"{int(time.time() * 1000):013d}-{uuid.uuid4().hex[:8]}"
+
+    def save(self, capture: ProfileCapture, files: Dict[str, bytes]):
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            for ext, data in files.items():
+                with open(self._path(capture.id, ext), "wb") as f:
+                    f.write(data)
+            # Metadata ditulis terakhir: capture baru terlihat setelah semua filenya lengkap.
+            with open(self._path(capture.id, "json"), "w", encoding="utf-8") as f:
+                f.write(capture.model_dump_json())
+            self._evict()
+
+    def list(self) -> List[ProfileCapture]:
+        captures = []
+        for capture_id in reversed(self._ids()):
+            try:
+                with open(self._path(capture_id, "json"), encoding="utf-8") as f:
+                    captures.append(ProfileCapture(**json.load(f)))
+            except (OSError, ValueError):
+                continue
+        return captures
+
+    def file(self, capture_id: str, ext: str) -> Optional[str]:
+        # ID divalidasi terhadap isi folder, jadi tidak bisa dipakai untuk path traversal.
+        if capture_id not in self._ids():
+            return None
+        path = self._path(capture_id, ext)
+        return path if os.path.exists(path) else None
+
+    def _ids(self) -> List[str]:
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return sorted(name[:-5] for name in names if name.endswith(".json"))
+
+    def _path(self, capture_id: str, ext: str) -> str:
+        return os.path.join(self.directory, f"{capture_id}.{ext}")
+
+    def _evict(self):
+        ids = self._ids()
+        for capture_id in ids[:max(0, len(ids) - self.max_captures)]:
+            for ext in FILE_EXTENSIONS:
+                try:
+                    os.remove(self._path(capture_id, ext))
+                except FileNotFoundError:
+                    pass
+
+
+class _RequestSamples:
+    __slots__ = ("thread_id", "frame", "stacks", "waiting")
+
+    def __init__(self, thread_id: int, frame):
+        self.thread_id = thread_id
+        self.frame = frame
+        self.stacks = Counter()
+        self.waiting = 0
+
+
+class StackSampler:
+    """
+    Thread yang mengambil stack thread event loop setiap `interval` detik selama ada
+    request yang sedang berjalan. Sampel langsung dihitung ke request pemiliknya: stack
+    milik sebuah request jika frame middleware request itu ada di dalam stack tersebut,
+    jadi coroutine request lain dan thread yang menganggur tidak ikut tercatat.
+
+    Hanya thread event loop yang disampel. Saat request sedang menunggu (await I/O atau
+    pekerjaan di threadpool, misalnya endpoint def biasa), sampelnya dihitung sebagai
+    WAITING_STACK; isi pekerjaan di threadpool tidak terlihat di profil ini.
+    Memori sebanding dengan jumlah stack unik dari request yang sedang berjalan saja.
+    """
+    WAITING_STACK = "(waiting: await / threadpool)"
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self._requests: Dict[int, _RequestSamples] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._labels: Dict[object, str] = {}
+        # Stack yang sama disimpan sebagai satu objek string; dikosongkan saat tidak ada request.
+        self._interned: Dict[str, str] = {}
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+            self._thread.start()
+
+    def request_started(self, frame) -> _RequestSamples:
+        """
+        Dipanggil dari coroutine middleware dengan frame-nya sendiri (sys._getframe()).
+        """
+        entry = _RequestSamples(threading.get_ident(), frame)
+        with self._lock:
+            self._requests[id(frame)] = entry
+        return entry
+
+    def request_finished(self, entry: _RequestSamples) -> Counter:
+        with self._lock:
+            self._requests.pop(id(entry.frame), None)
+            if not self._requests:
+                self._interned.clear()
+            stacks = entry.stacks
+            if entry.waiting:
+                stacks[self.WAITING_STACK] = entry.waiting
+            entry.frame = None
+            return stacks
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            if not self._requests:
+                continue
+            with self._lock:
+                thread_ids = {entry.thread_id for entry in self._requests.values()}
+            frames = sys._current_frames()
+
+            # Stack setiap thread event loop dilipat sekali, di luar lock.
+            sampled = {}
+            for thread_id in thread_ids:
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    sampled[thread_id] = self._fold(frame)
+            del frames
+
+            with self._lock:
+                for entry in self._requests.values():
+                    stack, frame_ids = sampled.get(entry.thread_id, (None, ()))
+                    if id(entry.frame) in frame_ids:
+                        stack = self._interned.setdefault(stack, stack)
+                        entry.stacks[stack] += 1
+                    else:
+                        entry.waiting += 1
+
+    def _fold(self, frame):
+        # Format folded: fungsi dari root ke leaf dipisah ';'. Juga mengembalikan id semua
+        # frame di stack (tanpa batas kedalaman) untuk mencocokkan frame middleware.
+        names = []
+        frame_ids = set()
+        while frame is not None:
+            frame_ids.add(id(frame))
+            if len(names) < MAX_STACK_DEPTH:
+                code = frame.f_code
+                label = self._labels.get(code)
+                if label is None:
+                    label = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+                    self._labels[code] = label
+                names.append(label)
+            frame = frame.f_back
+        return ";".join(reversed(names)), frame_ids
+
+
+class Profiler:
+    def __init__(self, enabled: bool, store: ProfileStore, slow_ms: float = 0.0, sample_interval_ms: float = 5.0):
+        self.enabled = enabled
+        self.store = store
+        self.slow_ms = slow_ms
+        self.sampler = StackSampler(sample_interval_ms / 1000) if slow_ms > 0 else None
+        # Hanya satu cProfile yang boleh aktif dalam satu waktu.
+        self._profile_lock = threading.Lock()
+        self._armed = 0
+        self._armed_prefix = "/api/"
+        self._arm_lock = threading.Lock()
+
+    def arm(self, count: int, path_prefix: str = "/api/"):
+        with self._arm_lock:
+            self._armed, self._armed_prefix = count, path_prefix
+
+    def armed(self) -> int:
+        return self._armed
+
+    def _take_armed(self, path: str) -> bool:
+        if not self._armed:
+            return False
+        with self._arm_lock:
+            if self._armed and path.startswith(self._armed_prefix):
+                self._armed -= 1
+                return True
+        return False
+
+    def wants_profile(self, scope) -> bool:
+        headers = dict(scope.get("headers") or [])
+        if headers.get(b"x-profile", b"").lower() in (b"1", b"true", b"yes"):
+            token = headers.get(b"x-admin-token")
+            if is_admin_token(token.decode("latin-1") if token else None):
+                return True
+        return self._take_armed(scope.get("path", ""))
+
+    def save_cprofile(self, capture: ProfileCapture, profile: cProfile.Profile):
+        summary = io.StringIO()
+        stats = pstats.Stats(profile, stream=summary)
+        stats.sort_stats("cumulative").print_stats(SUMMARY_LINES)
+        # Format .prof standar (marshal, sama seperti Stats.dump_stats), bisa dibuka dengan snakeviz / pstats.
+        raw = marshal.dumps(stats.stats)
+        self.store.save(capture, {"prof": raw, "txt": summary.getvalue().encode("utf-8")})
+
+    def save_sampled(self, capture: ProfileCapture, stacks: Counter):
+        folded = "\n".join(f"{stack} {count}" for stack, count in stacks.most_common())
+        self.store.save(capture, {"folded": folded.encode("utf-8")})
+
+
+class ProfilingMiddleware:
+    """
+    Middleware ASGI. Catatan: cProfile mengukur thread event loop selama request berjalan,
+    jadi coroutine lain yang berjalan bersamaan ikut tercatat.
+    """
+    def __init__(self, app, profiler: Profiler):
+        self.app = app
+        self.profiler = profiler
+        if profiler.sampler is not None:
+            profiler.sampler.start()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        profiler = self.profiler
+        profile = None
+        capture_id = None
+        if profiler.wants_profile(scope) and profiler._profile_lock.acquire(blocking=False):
+            profile = cProfile.Profile()
+            capture_id = profiler.store.new_id()
+
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if capture_id:
+                    message = dict(message, headers=list(message.get("headers", [])) + [
+                        (b"x-profile-id", capture_id.encode("latin-1"))
+                    ])
+            await send(message)
+
+        sampler = profiler.sampler
+        samples = sampler.request_started(sys._getframe()) if sampler is not None else None
+        start = time.monotonic()
+        try:
+            if profile is not None:
+                profile.enable()
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                if profile is not None:
+                    profile.disable()
+        finally:
+            end = time.monotonic()
+            stacks = sampler.request_finished(samples) if sampler is not None else None
+            duration_ms = (end - start) * 1000
+
+            try:
+                if profile is not None:
+                    profiler._profile_lock.release()
+                    profiler.save_cprofile(self._capture(capture_id, "cprofile", scope, status, duration_ms), profile)
+                elif stacks is not None and duration_ms >= profiler.slow_ms:
+                    capture = self._capture(profiler.store.new_id(), "sampled", scope, status, duration_ms)
+                    capture.samples = sum(stacks.values())
+                    profiler.save_sampled(capture, stacks)
+            except Exception as e:
+                print(f"Warning: Failed to save profile: {e}")
+
+    def _capture(self, capture_id: str, kind: str, scope, status: int, duration_ms: float) -> ProfileCapture:
+        return ProfileCapture(
+            id=capture_id,
+            kind=kind,
+            method=scope.get("method", ""),
+            path=scope.get("path", ""),
+            status=status,
+            duration_ms=round(duration_ms, 2),
+            created_at=datetime.now(timezone.utc)
+        )
+
+
+def _env_flag(name: str) -> bool:
+    return os.environ.get(name, "").strip().lower() in ("1", "true", "yes", "on")
+
+
+profiler = Profiler(
+    enabled=_env_flag("PROFILING_ENABLED"),
+    # Di Vercel hanya /tmp yang bisa ditulis.
+    store=ProfileStore(os.environ.get("PROFILE_DIR", "/tmp/agrismart-profiles"),
+                       int(os.environ.get("PROFILE_MAX_CAPTURES", "50"))),
+    slow_ms=float(os.environ.get("PROFILE_SLOW_MS", "0")),
+    sample_interval_ms=float(os.environ.get("PROFILE_SAMPLE_INTERVAL_MS", "5")),
+)
+
+
+def install_profiling(app):
+    """
+    Memasang middleware profiling hanya jika PROFILING_ENABLED=1.
+    """
+    if profiler.enabled:
+        app.add_middleware(ProfilingMiddleware, profiler=profiler)
@@ -0,0 +1,152 @@
+import numpy as np
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
+from app.ahp import AHPCalculator
+
+
+class ScoringEngine(ABC):
+    """
+    Agregator skor: mengubah matriks kecocokan (tanaman x kriteria, dihitung sekali
+    oleh AHPCalculator.match_matrix) menjadi satu skor per tanaman, secara vektor.
+    """
+    name = ""
+
+    def __init__(self, weights: np.ndarray):
+        # Bobot per kriteria, urutan sama dengan AHPCalculator.criteria.
+        self.weights = np.asarray(weights, dtype=float)
+
+    @property
+    def linear(self) -> bool:
+        """
+        True jika skor = matrix @ weights: skor setiap tanaman hanya bergantung pada barisnya
+        sendiri dan bisa dijumlah per kolom (dipakai app/seasonal.py).
+        """
+        return False
+
+    @abstractmethod
+    def scores(self, matrix: np.ndarray, stats: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Skor per baris matriks. `stats` (dari column_stats, boleh digabung antar potongan
+        dengan merge_stats) dipakai engine yang bergantung pada seluruh katalog, agar
+        matriks besar bisa dinilai per potongan.
+        """
+
+    def column_stats(self, matrix: np.ndarray) -> Optional[np.ndarray]:
+        # Engine yang skornya hanya bergantung pada barisnya sendiri tidak butuh statistik kolom.
+        return None
+
+    def merge_stats(self, a: Optional[np.ndarray], b: Optional[np.ndarray]) -> Optional[np.ndarray]:
+        return None
+
+
+class WeightedSumEngine(ScoringEngine):
+    """
+    Jumlah tertimbang: Skor = Sum(Bobot_i * Skor_Kecocokan_i). Metode AHP bawaan.
+    """
+    def __init__(self, name: str, weights: np.ndarray):
+        super().__init__(weights)
+        self.name = name
+
+    @property
+    def linear(self) -> bool:
+        return True
+
+    def scores(self, matrix: np.ndarray, stats: Optional[np.ndarray] = None) -> np.ndarray:
+        return matrix @ self.weights
+
+
+class TopsisEngine(ScoringEngine):
+    """
+    TOPSIS: kedekatan relatif setiap tanaman ke solusi ideal (skor kecocokan tertinggi
+    per kriteria di katalog) dibanding ke solusi anti-ideal (terendah).
+    Semua kriteria bersifat benefit (semakin cocok semakin baik).
+    """
+    name = "topsis"
+
+    def column_stats(self, matrix: np.ndarray) -> np.ndarray:
+        # Hanya reduksi per kolom yang bergantung pada seluruh katalog:
+        # jumlah kuadrat (untuk normalisasi), maksimum, dan minimum.
+        return np.stack([(matrix ** 2).sum(axis=0), matrix.max(axis=0), matrix.min(axis=0)])
+
+    def merge_stats(self, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        return np.stack([a[0] + b[0], np.maximum(a[1], b[1]), np.minimum(a[2], b[2])])
+
+    def scores(self, matrix: np.ndarray, stats: Optional[np.ndarray] = None) -> np.ndarray:
+        if stats is None:
+            stats = self.column_stats(matrix)
+
+        # 1. Normalisasi vektor per kolom, lalu dikali bobot.
+        norms = np.sqrt(stats[0])
+        normalized = np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+        weighted = normalized * self.weights
+
+        # 2. Jarak ke ideal positif (maks per kolom) dan ideal negatif (min per kolom).
+        # Bobot dan norma positif, jadi maks/min kolom cukup ditransformasi dengan cara yang sama.
+        best = np.divide(stats[1], norms, out=np.zeros_like(norms), where=norms > 0) * self.weights
+        worst = np.divide(stats[2], norms, out=np.zeros_like(norms), where=norms > 0) * self.weights
+        distance_best = np.sqrt(((weighted - best) ** 2).sum(axis=1))
+        distance_worst = np.sqrt(((weighted - worst) ** 2).sum(axis=1))
+
+        # 3. Kedekatan relatif (0..1). Jika semua tanaman identik, semuanya sama-sama ideal.
+        total = distance_best + distance_worst
+        return np.divide(distance_worst, total, out=np.ones_like(total), where=total > 0)
+
+
+def fuzzy_ahp_weights(pairwise_matrix: np.ndarray) -> np.ndarray:
+    """
+    Bobot Fuzzy AHP (metode rata-rata geometrik Buckley) dengan bilangan fuzzy segitiga:
+    penilaian a >= 1 menjadi (a-1, a, a+1) dibatasi ke [1, 9], kebalikannya (1/u, 1/m, 1/l).
+    Bobot fuzzy didefuzzifikasi dengan centroid lalu dinormalisasi.
+    """
+    a = np.asarray(pairwise_matrix, dtype=float)
+    upper = a >= 1
+    # Untuk penilaian >= 1 langsung; untuk kebalikannya dibentuk dari penilaian asal (1/a).
+    base = np.where(upper, a, 1.0 / a)
+    low = np.where(base == 1, 1.0, np.clip(base - 1, 1, 9))
+    high = np.where(base == 1, 1.0, np.clip(base + 1, 1, 9))
+    lower_tfn = np.where(upper, low, 1.0 / high)
+    middle_tfn = a
+    upper_tfn = np.where(upper, high, 1.0 / low)
+
+    n = a.shape[0]
+    # Rata-rata geometrik per baris untuk setiap komponen (l, m, u).
+    r_l = np.prod(lower_tfn, axis=1) ** (1.0 / n)
+    r_m = np.prod(middle_tfn, axis=1) ** (1.0 / n)
+    r_u = np.prod(upper_tfn, axis=1) ** (1.0 / n)
+
+    # w_i = r_i (x) (Sum r)^-1 ; kebalikan bilangan fuzzy membalik urutan (l, m, u).
+    w_l, w_m, w_u = r_l / r_u.sum(), r_m / r_m.sum(), r_u / r_l.sum()
+    crisp = (w_l + w_m + w_u) / 3
+    return crisp / crisp.sum()
+
+
+def build_engines(ahp_calculator: AHPCalculator) -> Dict[str, ScoringEngine]:
+    weights = np.array([ahp_calculator.weights[c] for c in ahp_calculator.criteria])
+    engines = [
+        WeightedSumEngine("ahp", weights),
+        TopsisEngine(weights),
+        WeightedSumEngine("fuzzy_ahp", fuzzy_ahp_weights(ahp_calculator.pairwise_matrix)),
+    ]
+    return {engine.name: engine for engine in engines}
+
+
+class ScoringRegistry:
+    """
+    Daftar engine yang bisa dipilih per request (field `method`). Engine baru cukup didaftarkan.
+    """
+    default = "ahp"
+
+    def __init__(self, ahp_calculator: AHPCalculator):
+        self.engines = build_engines(ahp_calculator)
+
+    def register(self, engine: ScoringEngine):
+        self.engines[engine.name] = engine
+
+    def get(self, name: str) -> ScoringEngine:
+        engine = self.engines.get(name or self.default)
+        if engine is None:
+            raise KeyError(f"Unknown scoring method '{name}'. Available: {', '.join(self.names())}")
+        return engine
+
+    def names(self) -> List[str]:
+        return list(self.engines)
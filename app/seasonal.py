@@ -0,0 +1,211 @@
+import os
+import numpy as np
+from typing import Dict, List, Optional
+from app.ahp import AHPCalculator, crop_arrays, criterion_scores, range_match_scores, ranking_order, round_scores
+from app.models import Crop, MatchDetails, SeasonalRecommendation
+
+# Panjang deret yang diterima: bulanan (12) atau mingguan (52), dimulai dari Januari.
+SERIES_LENGTHS = (12, 52)
+
+# Kriteria yang dinilai dari deret iklim; sisanya tidak bergantung waktu tanam.
+SEASONAL_CRITERIA = ("rain", "temp")
+
+# Jumlah sel (tanaman x jendela) per potongan: array antara tetap muat di cache CPU.
+CHUNK_CELLS = 32768
+
+# Batas kerja satu request (tunggal maupun batch): sel matriks kecocokan tanaman x langkah
+# deret x kriteria, dijumlah atas semua kebun; engine non-linier dihitung dua kali (dua lintasan).
+MAX_CELLS = int(os.environ.get("SEASONAL_MAX_CELLS", "60000000"))
+
+
+def validate_series(rain: List[float], temp: List[float]) -> int:
+    if len(rain) not in SERIES_LENGTHS:
+        raise ValueError(f"rain must have {' or '.join(map(str, SERIES_LENGTHS))} values, got {len(rain)}")
+    if len(temp) != len(rain):
+        raise ValueError(f"temp must have the same length as rain ({len(rain)}), got {len(temp)}")
+    return len(rain)
+
+
+def check_size(n_crops: int, steps: List[int], n_criteria: int, engine=None):
+    """
+    Menolak request yang terlalu berat berdasarkan total sel yang dihitung, bukan jumlah
+    kebun saja: katalog besar dengan deret mingguan jauh lebih berat daripada katalog kecil
+    bulanan. steps: panjang deret setiap kebun (satu elemen untuk request tunggal).
+    """
+    passes = 1 if engine is None or engine.linear else 2
+    cells = n_crops * sum(steps) * n_criteria * passes
+    if cells > MAX_CELLS:
+        raise ValueError(
+            f"request too large: {n_crops} crops x {sum(steps)} series values x {n_criteria} criteria"
+            f"{' x 2 passes' if passes > 1 else ''} = {cells} cells (max {MAX_CELLS}); "
+            f"use fewer farms per request or a shorter series"
+        )
+
+
+def window_steps(season_months: np.ndarray, steps: int) -> np.ndarray:
+    """
+    Lama musim tanam setiap tanaman dalam satuan langkah deret (bulan atau minggu), 1..steps.
+    """
+    return np.clip(np.rint(season_months * steps / 12).astype(int), 1, steps)
+
+
+def window_sums(values: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """
+    Jumlah setiap jendela melingkar (tahun berulang) untuk semua tanaman x semua awal jendela.
+    values: deret (langkah,) yang sama untuk semua tanaman, atau (tanaman x langkah).
+    lengths: panjang jendela per tanaman. Hasil: (tanaman x langkah).
+
+    Memakai cumsum atas deret yang diperpanjang melingkar, jadi setiap jendela cukup satu
+    pengurangan: sum(x[s:s+L]) = cs[s+L] - cs[s], tanpa dimensi bulan di dalam jendela.
+    Tanaman dikelompokkan per panjang jendela (paling banyak 12 atau 52 kelompok) agar
+    pengurangannya berupa slice, bukan indeks per elemen.
+    """
+    steps = values.shape[-1]
+    longest = int(lengths.max())
+    cs = np.zeros(values.shape[:-1] + (steps + longest + 1,))
+    np.cumsum(values, axis=-1, out=cs[..., 1:steps + 1])
+    cs[..., steps + 1:] = cs[..., 1:longest + 1] + cs[..., steps:steps + 1]
+
+    sums = np.empty((len(lengths), steps))
+    for length in np.unique(lengths):
+        rows = np.flatnonzero(lengths == length)
+        if values.ndim == 1:
+            # Deret yang sama untuk semua tanaman: satu baris per panjang jendela.
+            sums[rows] = cs[length:length + steps] - cs[:steps]
+        else:
+            block = cs[rows]
+            sums[rows] = block[:, length:length + steps] - block[:, :steps]
+    return sums
+
+
+class SeasonalScorer:
+    """
+    Penilaian kesesuaian per waktu tanam: setiap tanaman dinilai di setiap jendela tanam
+    (awal bulan/minggu x lama musim tanam tanaman tersebut) sekaligus secara vektor.
+    - Curah hujan: total hujan selama jendela, disetahunkan (x langkah/lama jendela),
+      dibandingkan dengan rentang rain_min/rain_max (mm/tahun).
+    - Suhu: rata-rata skor kecocokan suhu setiap bulan/minggu di dalam jendela.
+    Kriteria lain (pH, sinar, irigasi, tanah) dari jawaban kuesioner, sama seperti rank_crops.
+    """
+    def __init__(self, ahp_calculator: AHPCalculator):
+        self.ahp = ahp_calculator
+
+    def window_matrix(self, user_inputs: Dict[str, any], arrays: Dict[str, np.ndarray], rain: np.ndarray, temp: np.ndarray):
+        """
+        Skor kecocokan per kriteria untuk tanaman x jendela (arrays dari crop_arrays, boleh
+        potongan baris). Mengembalikan dict kriteria -> array (tanaman x langkah) untuk
+        rain/temp, atau (tanaman,) untuk kriteria statis.
+        """
+        steps = len(rain)
+        lengths = window_steps(arrays["season_months"], steps)
+
+        columns = {
+            c: criterion_scores(c, user_inputs[c], arrays)
+            for c in self.ahp.criteria if c not in SEASONAL_CRITERIA
+        }
+
+        annual_rain = window_sums(rain, lengths) * (steps / lengths)[:, None]
+        columns["rain"] = range_match_scores(annual_rain, arrays["rain_min"][:, None], arrays["rain_max"][:, None])
+
+        monthly_temp = range_match_scores(temp[None, :], arrays["temp_min"][:, None], arrays["temp_max"][:, None])
+        columns["temp"] = window_sums(monthly_temp, lengths) / lengths[:, None]
+        return columns
+
+    def window_rows(self, columns: Dict[str, np.ndarray]) -> np.ndarray:
+        """
+        Setiap pasangan tanaman-jendela sebagai satu baris matriks kecocokan ((tanaman x langkah) x kriteria).
+        """
+        criteria = self.ahp.criteria
+        n_crops, steps = columns["rain"].shape
+        matrix = np.empty((n_crops, steps, len(criteria)))
+        for j, c in enumerate(criteria):
+            matrix[:, :, j] = columns[c] if columns[c].ndim == 2 else columns[c][:, None]
+        return matrix.reshape(-1, len(criteria))
+
+    def window_scores(self, columns: Dict[str, np.ndarray], engine=None, stats: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Skor akhir tanaman x jendela. Untuk engine non-linier, `stats` adalah statistik kolom
+        seluruh katalog (engine.column_stats) jika columns hanya satu potongan tanaman.
+        """
+        criteria = self.ahp.criteria
+        if engine is None or engine.linear:
+            weights = engine.weights if engine is not None else np.array([self.ahp.weights[c] for c in criteria])
+            # Engine linier: bagian statis dihitung sekali per tanaman lalu ditambah bagian musiman.
+            static = sum(w * columns[c] for c, w in zip(criteria, weights) if c not in SEASONAL_CRITERIA)
+            seasonal = sum(w * columns[c] for c, w in zip(criteria, weights) if c in SEASONAL_CRITERIA)
+            return static[:, None] + seasonal
+
+        # Engine non-linier (TOPSIS): setiap pasangan tanaman-jendela menjadi satu baris matriks.
+        return engine.scores(self.window_rows(columns), stats).reshape(columns["rain"].shape)
+
+    def rank(self, user_inputs: Dict[str, any], crops: List[Crop], rain: List[float], temp: List[float],
+             engine=None, top_k: Optional[int] = None, include_windows: bool = False) -> List[SeasonalRecommendation]:
+        """
+        Peringkat tanaman berdasarkan skor pada waktu tanam terbaiknya masing-masing.
+        """
+        steps = validate_series(rain, temp)
+        rain, temp = np.asarray(rain, dtype=float), np.asarray(temp, dtype=float)
+        arrays = crop_arrays(crops)
+        criteria = self.ahp.criteria
+        n_crops = len(crops)
+
+        best_start = np.empty(n_crops, dtype=int)
+        best = np.empty(n_crops)
+        details = np.empty((n_crops, len(criteria)))
+        all_scores = np.empty((n_crops, steps)) if include_windows else None
+
+        # Semua engine dihitung per potongan tanaman agar memori tetap kecil untuk katalog besar.
+        chunk = max(1, CHUNK_CELLS // steps)
+
+        def chunks():
+            for start in range(0, n_crops, chunk):
+                part = {name: values[start:start + chunk] for name, values in arrays.items()}
+                yield start, self.window_matrix(user_inputs, part, rain, temp)
+
+        # Engine non-linier (TOPSIS) bergantung pada seluruh tanaman-jendela (norma dan solusi
+        # ideal per kolom): lintasan pertama hanya mengumpulkan statistik kolomnya.
+        stats = None
+        if engine is not None and not engine.linear:
+            for _, columns in chunks():
+                part_stats = engine.column_stats(self.window_rows(columns))
+                stats = part_stats if stats is None else engine.merge_stats(stats, part_stats)
+
+        for start, columns in chunks():
+            scores = self.window_scores(columns, engine, stats)
+
+            # Jendela terbaik per tanaman (jika seri, yang paling awal dalam tahun). Seri dibandingkan
+            # dengan toleransi agar selisih pembulatan antar potongan tidak memindahkan jendela.
+            window = (scores >= scores.max(axis=1, keepdims=True) - 1e-9).argmax(axis=1)
+            rows = np.arange(len(window))
+            block = slice(start, start + len(window))
+            best_start[block] = window
+            best[block] = scores[rows, window]
+            for j, c in enumerate(criteria):
+                details[block, j] = columns[c][rows, window] if columns[c].ndim == 2 else columns[c]
+            if include_windows:
+                all_scores[block] = scores
+
+        # Hanya top_k teratas yang diurutkan dan dibentuk menjadi objek respons. Kandidat
+        # diambil dengan partition (semua skor >= skor ke-k, termasuk yang seri) lalu diurutkan
+        # dengan aturan yang sama seperti rank_crops (skor dibulatkan turun, seri menurut urutan
+        # katalog), jadi hasilnya sama dengan mengurutkan seluruh katalog.
+        best = round_scores(best)
+        candidates = np.arange(n_crops)
+        if top_k is not None and top_k < n_crops:
+            threshold = -np.partition(-best, top_k - 1)[top_k - 1]
+            candidates = np.flatnonzero(best >= threshold)
+        order = candidates[ranking_order(best[candidates])][:top_k]
+
+        recommendations = []
+        for i in order:
+            start = int(best_start[i])
+            recommendations.append(SeasonalRecommendation(
+                crop_name=crops[i].name,
+                score=float(best[i]),
+                best_month=start * 12 // steps + 1,
+                best_start=start,
+                season_months=int(arrays["season_months"][i]),
+                match_details=MatchDetails(**dict(zip(criteria, details[i].tolist()))),
+                window_scores=round_scores(all_scores[i]).tolist() if include_windows else None,
+            ))
+        return recommendations
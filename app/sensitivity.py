@@ -0,0 +1,170 @@
+import os
+import numpy as np
+from typing import List, Dict, Optional
+from app.ahp import AHPCalculator, ranking_order
+from app.models import Crop, CropStability, JudgmentSweep, SensitivityResponse
+
+# Skala Saaty lengkap (1/9 ... 1 ... 9) yang digunakan untuk sapuan one-at-a-time.
+SAATY_SCALE = np.array([1/9, 1/8, 1/7, 1/6, 1/5, 1/4, 1/3, 1/2, 1, 2, 3, 4, 5, 6, 7, 8, 9], dtype=float)
+
+# Batas jumlah sel (sampel x tanaman) yang diproses dalam satu potongan
+# agar pemakaian memori tetap terkendali untuk katalog besar.
+CHUNK_CELLS = 4_000_000
+
+# Batas kerja satu analisis: sampel x tanaman (sel yang diberi peringkat).
+MAX_CELLS = int(os.environ.get("SENSITIVITY_MAX_CELLS", "20000000"))
+
+
+def check_analysis_size(samples: int, n_crops: int):
+    """
+    Menolak analisis yang terlalu berat untuk katalog ini, misalnya 20 ribu sampel atas
+    katalog puluhan ribu tanaman.
+    """
+    cells = samples * n_crops
+    if cells > MAX_CELLS:
+        raise ValueError(
+            f"analysis too large: {samples} samples x {n_crops} crops = {cells} cells "
+            f"(max {MAX_CELLS}); request at most {max(1, MAX_CELLS // max(n_crops, 1))} samples"
+        )
+
+
+class SensitivityAnalyzer:
+    """
+    Analisis sensitivitas bobot AHP: seberapa stabil peringkat tanaman jika
+    penilaian pada matriks perbandingan berpasangan sedikit berubah.
+    """
+    def __init__(self, ahp_calculator: AHPCalculator):
+        self.ahp = ahp_calculator
+        n = len(self.ahp.criteria)
+        # Indeks segitiga atas matriks (pasangan kriteria yang dinilai).
+        self.upper_i, self.upper_j = np.triu_indices(n, k=1)
+
+    def perturbed_matrices(self, samples: int, spread: float, rng: np.random.Generator) -> np.ndarray:
+        """
+        Membuat sampel Monte Carlo matriks perbandingan berpasangan.
+        Setiap penilaian a_ij dikalikan dengan noise log-normal (sigma = spread),
+        dibatasi ke skala Saaty [1/9, 9], lalu a_ji = 1 / a_ij agar tetap resiprokal.
+        """
+        base = self.ahp.pairwise_matrix[self.upper_i, self.upper_j]
+        noise = rng.normal(0.0, spread, size=(samples, len(base)))
+        judgments = np.clip(base * np.exp(noise), 1/9, 9.0)
+        return self._assemble(judgments)
+
+    def _assemble(self, judgments: np.ndarray) -> np.ndarray:
+        # Menyusun kembali matriks resiprokal penuh dari nilai segitiga atas.
+        n = len(self.ahp.criteria)
+        matrices = np.ones((len(judgments), n, n))
+        matrices[:, self.upper_i, self.upper_j] = judgments
+        matrices[:, self.upper_j, self.upper_i] = 1.0 / judgments
+        return matrices
+
+    def _rank_matrix(self, weights: np.ndarray, match_matrix: np.ndarray) -> np.ndarray:
+        """
+        Mengembalikan urutan tanaman (sampel x tanaman) untuk setiap vektor bobot:
+        kolom ke-r berisi indeks tanaman pada peringkat r.
+        """
+        # Aturan yang sama dengan rank_crops (skor 4 desimal, sort stabil), sehingga peringkat
+        # baseline sama dengan posisi tanaman di /api/recommend, termasuk saat skor seri.
+        return ranking_order(weights @ match_matrix.T)
+
+    def analyze(self, user_inputs: Dict[str, any], crops: List[Crop], samples: int = 1000,
+                spread: float = 0.3, top_k: int = 3, seed: Optional[int] = None) -> SensitivityResponse:
+        """
+        Menjalankan analisis Monte Carlo dan sapuan one-at-a-time untuk satu input pengguna.
+        """
+        rng = np.random.default_rng(seed)
+        n_crops = len(crops)
+        top_k = max(1, min(top_k, n_crops))
+
+        # Matriks kecocokan (tanaman x kriteria) cukup dihitung sekali;
+        # hanya bobotnya yang berubah antar sampel.
+        match_matrix = self.ahp.match_matrix(user_inputs, crops)
+        base_weights = np.array([self.ahp.weights[c] for c in self.ahp.criteria])
+        base_scores = match_matrix @ base_weights
+        # Skor baseline dihitung persis seperti rank_crops (matrix @ bobot) agar pembulatannya sama.
+        base_order = ranking_order(base_scores)
+        base_rank = np.empty(n_crops, dtype=int)
+        base_rank[base_order] = np.arange(n_crops)
+
+        # 1. Monte Carlo: ribuan vektor bobot dalam satu operasi matriks per potongan.
+        matrices = self.perturbed_matrices(samples, spread, rng)
+        weights = self.ahp.batch_weights(matrices)
+        cr = self.ahp.batch_consistency_ratio(matrices, weights)
+
+        same_rank = np.zeros(n_crops)
+        rank_sum = np.zeros(n_crops)
+        rank_counts = np.zeros((n_crops, top_k))
+        chunk = max(1, CHUNK_CELLS // max(n_crops, 1))
+        for start in range(0, samples, chunk):
+            order = self._rank_matrix(weights[start:start + chunk], match_matrix)
+            rows = np.arange(len(order))[:, None]
+            ranks = np.empty_like(order)
+            ranks[rows, order] = np.arange(n_crops)
+
+            same_rank += (ranks == base_rank).sum(axis=0)
+            rank_sum += ranks.sum(axis=0)
+            for r in range(top_k):
+                rank_counts[:, r] += np.bincount(order[:, r], minlength=n_crops)
+        in_top_k = rank_counts.sum(axis=1)
+
+        stability = [
+            CropStability(
+                crop_name=crop.name,
+                baseline_rank=int(base_rank[i]) + 1,
+                baseline_score=round(float(base_scores[i]), 4),
+                p_same_rank=round(float(same_rank[i] / samples), 4),
+                p_top_k=round(float(in_top_k[i] / samples), 4),
+                mean_rank=round(float(rank_sum[i] / samples) + 1, 2),
+                rank_probabilities=[round(float(p), 4) for p in rank_counts[i] / samples]
+            )
+            for i, crop in enumerate(crops)
+        ]
+        stability.sort(key=lambda s: s.baseline_rank)
+
+        # 2. Sapuan one-at-a-time per penilaian berpasangan.
+        sweeps = self.sweep(match_matrix, base_order, top_k)
+
+        return SensitivityResponse(
+            samples=samples,
+            spread=spread,
+            top_k=top_k,
+            consistent_ratio=round(float((cr <= 0.10).mean()), 4),
+            crops=stability,
+            sweeps=sweeps
+        )
+
+    def sweep(self, match_matrix: np.ndarray, base_order: np.ndarray, top_k: int) -> List[JudgmentSweep]:
+        """
+        Sapuan one-at-a-time: setiap penilaian a_ij diganti dengan seluruh nilai skala Saaty
+        (penilaian lain tetap), lalu dicari rentang nilai yang tidak mengubah himpunan top-k.
+        """
+        base = self.ahp.pairwise_matrix[self.upper_i, self.upper_j]
+        n_pairs, n_steps = len(base), len(SAATY_SCALE)
+
+        # Semua variasi (pasangan x skala) disusun sebagai satu batch matriks.
+        judgments = np.repeat(base[None, :], n_pairs * n_steps, axis=0)
+        pair_index = np.repeat(np.arange(n_pairs), n_steps)
+        judgments[np.arange(len(judgments)), pair_index] = np.tile(SAATY_SCALE, n_pairs)
+
+        weights = self.ahp.batch_weights(self._assemble(judgments))
+        top_sets = np.sort(self._rank_matrix(weights, match_matrix)[:, :top_k], axis=1)
+        unchanged = (top_sets == np.sort(base_order[:top_k])).all(axis=1).reshape(n_pairs, n_steps)
+
+        sweeps = []
+        for p in range(n_pairs):
+            # Rentang kontigu di sekitar nilai awal yang mempertahankan top-k.
+            center = int(np.argmin(np.abs(np.log(SAATY_SCALE) - np.log(base[p]))))
+            lo = hi = center
+            while lo > 0 and unchanged[p, lo - 1]:
+                lo -= 1
+            while hi < n_steps - 1 and unchanged[p, hi + 1]:
+                hi += 1
+            sweeps.append(JudgmentSweep(
+                criterion_a=self.ahp.criteria[self.upper_i[p]],
+                criterion_b=self.ahp.criteria[self.upper_j[p]],
+                baseline_value=round(float(base[p]), 4),
+                stable_min=round(float(SAATY_SCALE[lo]), 4),
+                stable_max=round(float(SAATY_SCALE[hi]), 4),
+                top_k_changes=int((~unchanged[p]).sum())
+            ))
+        return sweeps
@@ -0,0 +1,151 @@
+import os
+import json
+import threading
+import numpy as np
+from typing import Dict, List, Tuple
+
+# Jenis tanah (tekstur) yang dikenal. Posisi dalam daftar = kode integer awal.
+SOIL_TYPES = ["Clay", "Clay Loam", "Silt", "Silt Loam", "Loam", "Sandy Loam", "Sandy"]
+
+# Kecocokan parsial antar jenis tanah (0.0 - 1.0), berlaku simetris.
+# Jenis yang sama selalu 1.0; pasangan yang tidak disebut dianggap 0.0.
+# Nilai mengikuti kedekatan kelas tekstur (segitiga tekstur tanah USDA).
+SOIL_COMPATIBILITY: Dict[Tuple[str, str], float] = {
+    ("Clay", "Clay Loam"): 0.7,
+    ("Clay", "Silt Loam"): 0.3,
+    ("Clay", "Loam"): 0.3,
+    ("Clay Loam", "Silt Loam"): 0.5,
+    ("Clay Loam", "Loam"): 0.7,
+    ("Clay Loam", "Sandy Loam"): 0.3,
+    ("Silt", "Silt Loam"): 0.7,
+    ("Silt", "Loam"): 0.5,
+    ("Silt Loam", "Loam"): 0.7,
+    ("Silt Loam", "Sandy Loam"): 0.3,
+    ("Loam", "Sandy Loam"): 0.7,
+    ("Loam", "Sandy"): 0.3,
+    ("Sandy Loam", "Sandy"): 0.7,
+}
+
+
+class SoilCompatibility:
+    """
+    Tabel kecocokan jenis tanah berbasis kode integer.
+    Setiap jenis tanah katalog di-intern menjadi kode sekali saja, sehingga skor tanah
+    untuk seluruh katalog cukup satu lookup tabel: matrix[kode_user, kode_tanaman].
+    """
+    def __init__(self, types: List[str] = SOIL_TYPES, pairs: Dict[Tuple[str, str], float] = SOIL_COMPATIBILITY):
+        self.base_types = [t.lower() for t in types]
+        n = len(types)
+        base = np.eye(n)
+        for (a, b), value in pairs.items():
+            i, j = self.base_types.index(a.lower()), self.base_types.index(b.lower())
+            base[i, j] = base[j, i] = value
+        self.base = base
+
+        self.matrix = base.copy()
+        self.codes = {t: i for i, t in enumerate(self.base_types)}
+        # Komponen (indeks jenis dasar) dari setiap kode; jenis dasar = dirinya sendiri.
+        self.components = [[i] for i in range(n)]
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(soil: str) -> str:
+        return " ".join(str(soil).lower().split())
+
+    def _components(self, key: str) -> List[int]:
+        """
+        Indeks jenis dasar yang disebut di dalam sebuah string jenis tanah.
+        Nama jenis dasar terpanjang dicocokkan lebih dulu ('sandy loam' sebelum 'loam').
+        """
+        components = []
+        remaining = f" {key} "
+        for i in sorted(range(len(self.base_types)), key=lambda i: -len(self.base_types[i])):
+            token = f" {self.base_types[i]} "
+            if token in remaining:
+                components.append(i)
+                remaining = remaining.replace(token, " ")
+        return components
+
+    def _row(self, components: List[int], others: List[List[int]]) -> np.ndarray:
+        """
+        Kecocokan = maksimum kecocokan antar jenis dasar dari kedua sisi.
+        """
+        return np.array([
+            max((self.base[a, b] for a in components for b in other), default=0.0)
+            for other in others
+        ])
+
+    def register(self, soil: str) -> int:
+        """
+        Kode integer untuk jenis tanah katalog. String baru yang bukan jenis dasar
+        (misalnya 'Sandy Clay Loam') didaftarkan permanen, jadi hanya dipanggil saat
+        katalog dimuat (crop_arrays), tidak untuk input pengguna.
+        """
+        key = self._key(soil)
+        code = self.codes.get(key)
+        if code is not None:
+            return code
+        with self._lock:
+            if key in self.codes:
+                return self.codes[key]
+            components = self._components(key)
+            row = self._row(components, self.components)
+            code = len(self.components)
+            matrix = np.zeros((code + 1, code + 1))
+            matrix[:code, :code] = self.matrix
+            matrix[code, :code] = matrix[:code, code] = row
+            matrix[code, code] = 1.0
+
+            self.matrix = matrix
+            self.components.append(components)
+            self.codes[key] = code
+            return code
+
+    def row(self, soil: str) -> np.ndarray:
+        """
+        Baris kecocokan sebuah jenis tanah terhadap semua kode terdaftar. Jenis yang belum
+        terdaftar (teks bebas dari pengguna atau chat) dihitung sementara dari komponen
+        teksturnya tanpa didaftarkan, agar tabel tidak tumbuh karena input pengguna.
+        """
+        key = self._key(soil)
+        code = self.codes.get(key)
+        if code is not None:
+            return self.matrix[code]
+        # Salinan daftar komponen: kode yang didaftarkan bersamaan tidak ikut dihitung,
+        # tetapi semua kode tanaman yang sudah ada tetap tercakup.
+        return self._row(self._components(key), list(self.components))
+
+    def pair_score(self, user_soil: str, crop_soil: str) -> float:
+        """
+        Kecocokan satu pasang jenis tanah, tanpa mendaftarkan keduanya.
+        """
+        crop_key = self._key(crop_soil)
+        crop_code = self.codes.get(crop_key)
+        if crop_code is not None:
+            return float(self.row(user_soil)[crop_code])
+        if crop_key == self._key(user_soil):
+            return 1.0
+        return float(self._row(self._components(self._key(user_soil)), [self._components(crop_key)])[0])
+
+    def scores(self, user_soil: str, crop_codes: np.ndarray) -> np.ndarray:
+        """
+        Skor kecocokan tanah pengguna terhadap seluruh tanaman (satu lookup baris tabel).
+        """
+        return self.row(user_soil)[crop_codes]
+
+
+def load_soil_compatibility() -> SoilCompatibility:
+    """
+    Tabel default, atau dari file JSON pada SOIL_COMPATIBILITY_PATH dengan format:
+    {"types": ["Clay", "Loam", ...], "pairs": [["Loam", "Silt", 0.5], ...]}
+    """
+    path = os.environ.get("SOIL_COMPATIBILITY_PATH")
+    if not path:
+        return SoilCompatibility()
+    with open(path, encoding='utf-8') as f:
+        config = json.load(f)
+    pairs = {(a, b): float(value) for a, b, value in config["pairs"]}
+    return SoilCompatibility(config.get("types", SOIL_TYPES), pairs)
+
+
+soil_compatibility = load_soil_compatibility()
@@ -0,0 +1,171 @@
+import os
+import re
+import gzip
+import hashlib
+import mimetypes
+import posixpath
+from typing import Dict, Optional
+from fastapi import Request
+from fastapi.responses import Response, PlainTextResponse
+
+try:
+    import brotli
+except ImportError:  # ada di requirements.txt; tanpa paketnya hanya gzip yang disiapkan
+    brotli = None
+
+# Aset dengan ?v=<hash> yang cocok boleh di-cache selamanya oleh browser/CDN.
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+# HTML dan aset tanpa hash yang cocok harus divalidasi ulang (ETag -> 304).
+REVALIDATE_CACHE = "no-cache"
+
+# Berkas di bawah ukuran ini tidak dikompresi (overhead header lebih besar dari hematnya).
+MIN_COMPRESS_SIZE = 256
+
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml")
+
+# Atribut src/href yang menunjuk ke berkas lokal (tanpa skema, tanpa fragment).
+ASSET_REFERENCE = re.compile(r'(src|href)="([^":#?]+)(\?[^"#]*)?"')
+
+
+class StaticAsset:
+    def __init__(self, body: bytes, content_type: str):
+        self.body = body
+        self.content_type = content_type
+        self.hash = hashlib.sha256(body).hexdigest()[:16]
+        # Varian terkompresi disiapkan sekali saat startup.
+        self.variants: Dict[str, bytes] = {"identity": body}
+        if len(body) >= MIN_COMPRESS_SIZE and content_type.startswith(COMPRESSIBLE_TYPES):
+            gz = gzip.compress(body, compresslevel=9, mtime=0)
+            if len(gz) < len(body):
+                self.variants["gzip"] = gz
+            if brotli is not None:
+                br = brotli.compress(body, quality=11)
+                if len(br) < len(body):
+                    self.variants["br"] = br
+
+    def etag(self, encoding: str) -> str:
+        return f'"{self.hash}"' if encoding == "identity" else f'"{self.hash}-{encoding}"'
+
+
+class StaticAssetStore:
+    """
+    Menyimpan seluruh isi folder static/ di memori, lengkap dengan varian gzip/brotli,
+    ETag berbasis hash isi, dan Cache-Control jangka panjang untuk aset ber-hash.
+    """
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.assets: Dict[str, StaticAsset] = {}
+        self.load()
+
+    def load(self):
+        raw = {}
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.startswith("."):
+                    continue
+                full_path = os.path.join(root, name)
+                rel_path = os.path.relpath(full_path, self.directory).replace(os.sep, "/")
+                with open(full_path, "rb") as f:
+                    raw[rel_path] = f.read()
+
+        assets = {}
+        # Aset non-HTML lebih dulu, agar HTML bisa merujuknya dengan ?v=<hash>.
+        for rel_path, body in raw.items():
+            if not rel_path.endswith(".html"):
+                assets[rel_path] = StaticAsset(body, _content_type(rel_path))
+        referenced = dict(assets)
+        for rel_path, body in raw.items():
+            if rel_path.endswith(".html"):
+                html = self._version_references(rel_path, body.decode("utf-8"), referenced)
+                assets[rel_path] = StaticAsset(html.encode("utf-8"), _content_type(rel_path))
+        self.assets = assets
+
+    def _version_references(self, html_path: str, html: str, assets: Dict[str, StaticAsset]) -> str:
+        # Ganti style.css / script.js?v=2 menjadi style.css?v=<hash> (cache busting otomatis).
+        base_dir = posixpath.dirname(html_path)
+
+        def replace(match):
+            attr, ref = match.group(1), match.group(2)
+            target = ref.lstrip("/") if ref.startswith("/") else posixpath.normpath(posixpath.join(base_dir, ref))
+            asset = assets.get(target)
+            if asset is None:
+                return match.group(0)
+            return f'{attr}="{ref}?v={asset.hash}"'
+
+        return ASSET_REFERENCE.sub(replace, html)
+
+    def get(self, path: str) -> Optional[StaticAsset]:
+        return self.assets.get(path.lstrip("/") or "index.html")
+
+    def response(self, path: str, request: Request) -> Response:
+        asset = self.get(path)
+        if asset is None:
+            # Aset (ada ekstensi berkas) yang tidak ada -> 404, bukan HTML fallback.
+            if "." in posixpath.basename(path):
+                return PlainTextResponse("Not Found", status_code=404)
+            asset = self.assets.get("index.html")
+            if asset is None:
+                return PlainTextResponse("Not Found", status_code=404)
+
+        if asset.content_type.startswith("text/html") or request.query_params.get("v") != asset.hash:
+            cache_control = REVALIDATE_CACHE
+        else:
+            cache_control = IMMUTABLE_CACHE
+        return asset_response(asset, request, cache_control)
+
+
+def asset_response(asset: StaticAsset, request: Request, cache_control: str = REVALIDATE_CACHE) -> Response:
+    """
+    Respons untuk sebuah aset: memilih varian terkompresi, mengirim ETag, dan 304 jika
+    If-None-Match cocok. Dipakai juga untuk konten dinamis yang di-cache (bundle katalog).
+    """
+    encoding = _negotiate(request.headers.get("accept-encoding", ""), asset.variants)
+    etag = asset.etag(encoding)
+
+    headers = {"ETag": etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+        return Response(status_code=304, headers=headers)
+    return Response(asset.variants[encoding], media_type=asset.content_type, headers=headers)
+
+
+def _content_type(path: str) -> str:
+    content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    if content_type.startswith("text/") or content_type == "application/javascript":
+        content_type += "; charset=utf-8"
+    return content_type
+
+
+def _negotiate(accept_encoding: str, variants: Dict[str, bytes]) -> str:
+    """
+    Memilih encoding dengan nilai q tertinggi dari header Accept-Encoding (q=0 = ditolak).
+    Preferensi server (br, gzip, lalu identity) hanya dipakai jika nilai q-nya sama.
+    Identity yang tidak disebut (langsung atau lewat '*') hanya menjadi pilihan terakhir.
+    """
+    accepted = {}
+    for part in accept_encoding.split(","):
+        token, *params = [item.strip() for item in part.split(";")]
+        if not token:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[token.lower()] = q
+
+    best, best_q = "identity", 0.0
+    for encoding in ("br", "gzip", "identity"):
+        if encoding != "identity" and encoding not in variants:
+            continue
+        q = accepted.get(encoding, accepted.get("*", 0.0))
+        # Lebih besar (bukan >=): pada nilai q yang sama, urutan preferensi server menang.
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
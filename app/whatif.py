@@ -0,0 +1,190 @@
+import os
+import time
+import uuid
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import List, Dict, Optional, Tuple
+from app.ahp import AHPCalculator, crop_arrays, criterion_scores, ranking_order, round_scores
+from app.models import Crop, Recommendation, MatchDetails, RankChange, ClimateRecord
+from app.mapping import map_answers_to_values
+from app.climate import climate as climate_service
+from app.scoring import ScoringEngine, WeightedSumEngine
+
+# Batas memori seluruh sesi dalam jumlah sel (matriks tanaman x kriteria + skor + peringkat).
+# 8 juta sel ~ 64 MB; katalog 50 ribu tanaman = 400 ribu sel per sesi.
+MAX_CELLS = int(os.environ.get("WHATIF_MAX_CELLS", "8000000"))
+
+
+class WhatIfSession:
+    """
+    Snapshot hasil rekomendasi terakhir satu pengguna: jawaban, nilai teknis,
+    matriks skor kecocokan (tanaman x kriteria), skor total, dan peringkatnya.
+    """
+    def __init__(self, session_id: str, crops: List[Crop], catalog_version: int, answers: Dict[str, str],
+                 values: Dict[str, any], matrix: np.ndarray, totals: np.ndarray, climate: Optional[ClimateRecord] = None,
+                 engine: Optional[ScoringEngine] = None):
+        self.session_id = session_id
+        self.catalog_version = catalog_version
+        self.crops = crops
+        self.arrays = crop_arrays(crops)
+        self.answers = answers
+        self.values = values
+        self.climate = climate
+        self.engine = engine
+        self.matrix = matrix
+        self.totals = totals
+        self.ranks = _ranks(totals)
+        self.touched = time.monotonic()
+
+    @property
+    def cells(self) -> int:
+        return self.matrix.size + self.totals.size + self.ranks.size
+
+
+def _ranks(totals: np.ndarray) -> np.ndarray:
+    # Peringkat (0 = terbaik) dengan aturan yang sama seperti rank_crops:
+    # skor dibulatkan 4 desimal, skor seri mengikuti urutan katalog.
+    order = ranking_order(totals)
+    ranks = np.empty(len(totals), dtype=int)
+    ranks[order] = np.arange(len(totals))
+    return ranks
+
+
+class WhatIfStore:
+    """
+    Penyimpanan sesi what-if di memori (LRU + TTL), dibatasi jumlah sesi dan total sel
+    (max_cells) agar katalog besar tidak menghabiskan memori.
+    Saat pengguna mengubah sebagian jawaban, hanya kolom kriteria yang berubah yang
+    dihitung ulang; skor total dihitung ulang dari matriks (O(tanaman x kriteria), murah)
+    agar tidak ada galat pembulatan yang menumpuk antar perubahan.
+    """
+    def __init__(self, ahp_calculator: AHPCalculator, max_sessions: int = 1000, ttl_seconds: float = 1800,
+                 max_cells: int = MAX_CELLS):
+        self.ahp = ahp_calculator
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.max_cells = max_cells
+        self._cells = 0
+        self._sessions: "OrderedDict[str, WhatIfSession]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._weights = np.array([self.ahp.weights[c] for c in self.ahp.criteria])
+        self.default_engine = WeightedSumEngine("ahp", self._weights)
+
+    def create(self, answers: Dict[str, str], crops: List[Crop], catalog_version: int = 0,
+               climate: Optional[ClimateRecord] = None,
+               engine: Optional[ScoringEngine] = None) -> Tuple[WhatIfSession, List[Recommendation]]:
+        """
+        Membuat sesi baru dengan perhitungan penuh (semua kriteria, semua tanaman).
+        """
+        engine = engine or self.default_engine
+        values = _values(answers, climate)
+        matrix = self.ahp.match_matrix(values, crops)
+        session = WhatIfSession(uuid.uuid4().hex, crops, catalog_version, dict(answers), values, matrix,
+                                engine.scores(matrix), climate, engine)
+
+        with self._lock:
+            self._evict(reserve=1, reserve_cells=session.cells)
+            self._sessions[session.session_id] = session
+            self._cells += session.cells
+        return session, self._recommendations(session)
+
+    def get(self, session_id: str, catalog_version: int = 0) -> Optional[WhatIfSession]:
+        """
+        Mengambil sesi aktif. Sesi dari versi katalog lama dianggap kedaluwarsa.
+        """
+        with self._lock:
+            self._evict()
+            session = self._sessions.get(session_id)
+            if session is not None and session.catalog_version != catalog_version:
+                del self._sessions[session_id]
+                self._cells -= session.cells
+                session = None
+            if session is not None:
+                session.touched = time.monotonic()
+                self._sessions.move_to_end(session_id)
+            return session
+
+    def update(self, session: WhatIfSession, answers: Dict[str, str], climate: Optional[ClimateRecord] = None,
+               engine: Optional[ScoringEngine] = None) -> Tuple[List[str], List[RankChange]]:
+        """
+        Menerapkan jawaban baru ke sesi. Mengembalikan kriteria yang berubah dan
+        daftar tanaman yang skor atau peringkatnya berubah (diff terhadap hasil sebelumnya).
+        Tanpa data iklim atau engine baru, pilihan sesi sebelumnya tetap dipakai.
+        """
+        if climate is not None:
+            session.climate = climate
+        engine_changed = engine is not None and engine is not session.engine
+        if engine_changed:
+            session.engine = engine
+        values = _values(answers, session.climate)
+        changed = [c for c in self.ahp.criteria if values[c] != session.values[c]]
+
+        previous_totals = session.totals
+        previous_ranks = session.ranks
+
+        # Hanya kolom yang berubah yang dihitung ulang.
+        for criterion in changed:
+            j = self.ahp.criteria.index(criterion)
+            session.matrix[:, j] = criterion_scores(criterion, values[criterion], session.arrays)
+        if changed or engine_changed:
+            # Skor total selalu dari matriks (hasil identik dengan rank_crops), bukan dikoreksi
+            # inkremental; engine non-linier (TOPSIS) memang butuh seluruh katalog.
+            session.totals = session.engine.scores(session.matrix)
+            session.ranks = _ranks(session.totals)
+
+        session.answers = dict(answers)
+        session.values = values
+
+        changes = []
+        for i in np.flatnonzero(
+            (session.ranks != previous_ranks) |
+            (round_scores(session.totals) != round_scores(previous_totals))
+        ):
+            changes.append(RankChange(
+                crop_name=session.crops[i].name,
+                rank=int(session.ranks[i]) + 1,
+                score=round(float(session.totals[i]), 4),
+                previous_rank=int(previous_ranks[i]) + 1,
+                previous_score=round(float(previous_totals[i]), 4),
+                match_details=self._match_details(session, i)
+            ))
+        changes.sort(key=lambda c: c.rank)
+        return changed, changes
+
+    def _recommendations(self, session: WhatIfSession) -> List[Recommendation]:
+        recommendations = [
+            Recommendation(
+                crop_name=crop.name,
+                score=round(float(session.totals[i]), 4),
+                match_details=self._match_details(session, i)
+            )
+            for i, crop in enumerate(session.crops)
+        ]
+        order = np.argsort(session.ranks)
+        return [recommendations[i] for i in order]
+
+    def _match_details(self, session: WhatIfSession, i: int) -> MatchDetails:
+        return MatchDetails(**dict(zip(self.ahp.criteria, session.matrix[i].tolist())))
+
+    def _evict(self, reserve: int = 0, reserve_cells: int = 0):
+        # Buang sesi kedaluwarsa (TTL) lalu sesi paling lama tidak dipakai (LRU)
+        # sampai tersisa tempat untuk `reserve` sesi baru berukuran `reserve_cells` sel.
+        now = time.monotonic()
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if (now - oldest.touched <= self.ttl_seconds
+                    and len(self._sessions) + reserve <= self.max_sessions
+                    and self._cells + reserve_cells <= self.max_cells):
+                break
+            self._sessions.popitem(last=False)
+            self._cells -= oldest.cells
+
+
+def _answer_list(answers: Dict[str, str]) -> List[Dict[str, str]]:
+    return [{"question_id": qid, "selected_option": code} for qid, code in answers.items()]
+
+
+def _values(answers: Dict[str, str], climate: Optional[ClimateRecord]) -> Dict[str, any]:
+    answer_list = _answer_list(answers)
+    return climate_service.apply(map_answers_to_values(answer_list), answer_list, climate)
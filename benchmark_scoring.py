@@ -0,0 +1,94 @@
+"""
+Benchmark for the scoring engines in app/scoring.py.
+
+The match matrix (crops x criteria) is computed once per request and shared by every
+engine, so this measures each part separately on synthetic catalogs:
+  - match_matrix: the shared vectorized core
+  - <engine>.scores: aggregation only, per engine
+  - rank_crops: the full default path (engine=None) vs. with each engine
+
+Examples:
+    python benchmark_scoring.py
+    python benchmark_scoring.py --sizes 1000 20000 --repeat 20
+    python benchmark_scoring.py --max-default-overhead 0.10
+"""
+import sys
+import time
+import random
+import argparse
+
+from app.ahp import AHPCalculator
+from app.models import Crop
+from app.scoring import ScoringRegistry
+
+USER_INPUTS = {"ph": 6.2, "rain": 1400.0, "temp": 26.0, "sun": 0.8, "irrigation": 0.6, "soil": "Loam"}
+
+
+def synthetic_catalog(size, rng):
+    crops = []
+    for i in range(size):
+        ph, rain, temp = rng.uniform(4.5, 7.0), rng.uniform(300, 2200), rng.uniform(12, 28)
+        crops.append(Crop(
+            id=str(i), name=f"Varietas {i + 1}",
+            ph_min=ph, ph_max=ph + rng.uniform(0.5, 1.5),
+            rain_min=rain, rain_max=rain + rng.uniform(300, 1200),
+            temp_min=temp, temp_max=temp + rng.uniform(4, 10),
+            sun_requirement=rng.choice(["Low", "Medium", "High"]),
+            soil_type=rng.choice(["Clay", "Loam", "Sandy", "Silt", "Sandy Loam", "Clay Loam"]),
+            irrigation_need=rng.choice(["Low", "Medium", "High"]),
+        ))
+    return crops
+
+
+def best_of(fn, repeat):
+    # Minimum over several runs: the least noisy estimate of the real cost.
+    fn()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark scoring engines over the shared match matrix.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000], help="Catalog sizes")
+    parser.add_argument("--repeat", type=int, default=10, help="Runs per measurement (best is reported)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--max-default-overhead", type=float,
+                        help="Fail (exit 1) if rank_crops with the 'ahp' engine is slower than engine=None by more than this fraction")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    ahp = AHPCalculator()
+    scoring = ScoringRegistry(ahp)
+    failed = []
+
+    for size in args.sizes:
+        crops = synthetic_catalog(size, rng)
+        matrix = ahp.match_matrix(USER_INPUTS, crops)
+
+        print(f"\n--- {size} crops ---")
+        print(f"{'step':<30}{'ms':>10}")
+        print(f"{'match_matrix':<30}{best_of(lambda: ahp.match_matrix(USER_INPUTS, crops), args.repeat):>10.3f}")
+        for name, engine in scoring.engines.items():
+            print(f"{name + '.scores':<30}{best_of(lambda: engine.scores(matrix), args.repeat):>10.3f}")
+
+        default = best_of(lambda: ahp.rank_crops(USER_INPUTS, crops), args.repeat)
+        print(f"{'rank_crops (default)':<30}{default:>10.3f}")
+        for name, engine in scoring.engines.items():
+            elapsed = best_of(lambda: ahp.rank_crops(USER_INPUTS, crops, engine), args.repeat)
+            print(f"{'rank_crops (' + name + ')':<30}{elapsed:>10.3f}")
+            if name == scoring.default and args.max_default_overhead is not None:
+                overhead = elapsed / default - 1
+                if overhead > args.max_default_overhead:
+                    failed.append(f"{size} crops: '{name}' engine is {overhead:.1%} slower than the default path")
+
+    if failed:
+        print("\nFAILED: " + "; ".join(failed))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
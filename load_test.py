@@ -0,0 +1,460 @@
+"""
+Load test for the recommendation API, fully in-process.
+
+Boots the FastAPI app (api/index.py) with in-memory stand-ins for Supabase
+(crops, user_inputs, catalog_meta) and for the Gemini chat model, then drives
+mixed traffic at a target request rate and reports throughput, latency
+percentiles and error rates per route.
+
+Examples:
+    python load_test.py --rps 50 --duration 20
+    python load_test.py --rps 200 --crops 5000 --chat-latency-ms 800 --max-p95-ms 500
+    python load_test.py --mix questions=1,recommend=5,whatif=3,sensitivity=1,chat=2
+    python load_test.py --mix questions=1,bundle=2,telemetry=1,chat=2   # client-side ranking
+    python load_test.py --mix seasonal=4,batch=1 --crops 20000
+"""
+import sys
+import io
+import time
+import uuid
+import json
+import random
+import asyncio
+import argparse
+import contextlib
+from datetime import datetime, timezone
+
+import httpx
+import numpy as np
+
+# Seed catalog, same rows as schema.sql
+SEED_CROPS = [
+    ("Padi", 5.0, 7.0, 1500, 2500, 20, 35, "High", "Clay", "High"),
+    ("Jagung", 5.5, 7.5, 500, 1500, 18, 32, "High", "Loam", "Medium"),
+    ("Cabai", 5.5, 6.8, 600, 1200, 18, 30, "High", "Sandy Loam", "Medium"),
+    ("Tomat", 6.0, 7.0, 600, 1500, 18, 27, "High", "Loam", "Medium"),
+    ("Bawang Merah", 6.0, 7.0, 350, 1000, 25, 32, "High", "Loam", "Medium"),
+    ("Kentang", 5.0, 6.5, 1500, 2500, 15, 20, "Medium", "Loam", "Medium"),
+    ("Sawi", 6.0, 7.0, 1000, 2000, 20, 30, "Medium", "Loam", "High"),
+]
+
+CHAT_MESSAGES = [
+    "Saya mau tanam tapi bingung.",
+    "tanaman apa saja yang tersedia?",
+    "Lahan saya dekat pantai, panas sekali.",
+    "Tanahnya lengket kalau dikepal.",
+    "Hujan hampir tiap hari di sini.",
+]
+
+DEFAULT_MIX = "questions=1,next=2,recommend=5,whatif=3,sensitivity=1,chat=2"
+
+
+# --- In-memory Supabase stand-in ---
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+
+class FakeQuery:
+    """
+    Supports the subset of the postgrest query builder used by the app.
+    """
+    def __init__(self, db, table):
+        self.db, self.table = db, table
+        self.op, self.payload, self.conflict = "select", None, None
+        self.filters, self.orders = [], []
+        self.start, self.end, self.max_rows = 0, None, None
+
+    def select(self, *args, **kwargs):
+        return self
+
+    def insert(self, payload):
+        self.op, self.payload = "insert", payload
+        return self
+
+    def upsert(self, payload, on_conflict=None, **kwargs):
+        self.op, self.payload, self.conflict = "upsert", payload, on_conflict
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def gte(self, column, value):
+        self.filters.append(lambda row: str(row.get(column)) >= str(value))
+        return self
+
+    def lt(self, column, value):
+        self.filters.append(lambda row: str(row.get(column)) < str(value))
+        return self
+
+    def or_(self, filters):
+        # Only the keyset cursor used by app.analytics: created_at > c OR (created_at = c AND id > i)
+        created_at = filters.split('"')[1]
+        row_id = filters.rsplit("id.gt.", 1)[1].rstrip(")")
+        self.filters.append(lambda row: (str(row.get("created_at")), str(row.get("id"))) > (created_at, row_id))
+        return self
+
+    def order(self, column, desc=False, **kwargs):
+        self.orders.append((column, desc))
+        return self
+
+    def range(self, start, end):
+        self.start, self.end = start, end
+        return self
+
+    def limit(self, count):
+        self.max_rows = count
+        return self
+
+    def execute(self):
+        rows = self.db.setdefault(self.table, [])
+        if self.op == "insert":
+            payload = self.payload if isinstance(self.payload, list) else [self.payload]
+            rows.extend(_with_defaults(row) for row in payload)
+            return FakeResponse(payload)
+        if self.op == "upsert":
+            index = {row.get(self.conflict): row for row in rows}
+            for row in (self.payload if isinstance(self.payload, list) else [self.payload]):
+                if row.get(self.conflict) in index:
+                    index[row.get(self.conflict)].update(row)
+                else:
+                    rows.append(_with_defaults(row))
+            return FakeResponse(self.payload)
+
+        result = [row for row in rows if all(f(row) for f in self.filters)]
+        for column, desc in reversed(self.orders):
+            result.sort(key=lambda row: str(row.get(column)), reverse=desc)
+        end = self.end + 1 if self.end is not None else None
+        result = result[self.start:end]
+        if self.max_rows is not None:
+            result = result[:self.max_rows]
+        return FakeResponse(result)
+
+
+class FakeRpc:
+    def __init__(self, db, name):
+        self.db, self.name = db, name
+
+    def execute(self):
+        if self.name == "bump_catalog_version":
+            meta = self.db["catalog_meta"][0]
+            meta["version"] += 1
+            return FakeResponse(meta["version"])
+        raise ValueError(f"Unknown rpc: {self.name}")
+
+
+class FakeSupabase:
+    def __init__(self, crops):
+        self.db = {
+            "crops": crops,
+            "user_inputs": [],
+            "catalog_meta": [{"key": "crops", "version": 1}],
+        }
+
+    def table(self, name):
+        return FakeQuery(self.db, name)
+
+    def rpc(self, name, params=None):
+        return FakeRpc(self.db, name)
+
+
+def _with_defaults(row):
+    return {"id": str(uuid.uuid4()), "created_at": datetime.now(timezone.utc).isoformat(), **row}
+
+
+def build_catalog(size, rng):
+    crops = [
+        dict(id=str(uuid.uuid4()), name=name, ph_min=ph_min, ph_max=ph_max, rain_min=rain_min, rain_max=rain_max,
+             temp_min=temp_min, temp_max=temp_max, sun_requirement=sun, soil_type=soil, irrigation_need=irr,
+             description=None)
+        for name, ph_min, ph_max, rain_min, rain_max, temp_min, temp_max, sun, soil, irr in SEED_CROPS
+    ]
+    # Synthetic varieties on top of the seed catalog for large-catalog runs
+    for i in range(max(0, size - len(crops))):
+        ph, rain, temp = rng.uniform(4.5, 7.0), rng.uniform(300, 2200), rng.uniform(12, 28)
+        crops.append(dict(
+            id=str(uuid.uuid4()), name=f"Varietas {i + 1}",
+            ph_min=round(ph, 1), ph_max=round(ph + rng.uniform(0.5, 1.5), 1),
+            rain_min=round(rain), rain_max=round(rain + rng.uniform(300, 1200)),
+            temp_min=round(temp, 1), temp_max=round(temp + rng.uniform(4, 10), 1),
+            sun_requirement=rng.choice(["Low", "Medium", "High"]),
+            soil_type=rng.choice(["Clay", "Loam", "Sandy", "Silt", "Sandy Loam", "Clay Loam"]),
+            irrigation_need=rng.choice(["Low", "Medium", "High"]),
+            description=None,
+        ))
+    return crops
+
+
+class FakeChatModel:
+    """
+    Stand-in for Gemini with configurable latency. Sleeps synchronously, like the
+    blocking SDK call it replaces.
+    """
+    def __init__(self, latency_ms, jitter_ms, error_rate, rng):
+        self.latency_ms, self.jitter_ms, self.error_rate, self.rng = latency_ms, jitter_ms, error_rate, rng
+
+    def __call__(self, message, history=[]):
+        delay = max(0.0, self.latency_ms + self.rng.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+        time.sleep(delay)
+        if self.rng.random() < self.error_rate:
+            raise RuntimeError("Fake model error")
+        return f"(fake) Anda bertanya: {message}"
+
+
+def install_fakes(args, rng):
+    import app.database
+    supabase = FakeSupabase(build_catalog(args.crops, rng))
+    # Modules import the client factories by name, so patch every loaded copy
+    for module in list(sys.modules.values()):
+        name = getattr(module, "__name__", "")
+        if name.startswith("app") or name.startswith("api"):
+            for factory in ("get_supabase_client", "get_supabase_admin_client"):
+                if hasattr(module, factory):
+                    setattr(module, factory, lambda: supabase)
+
+    from app.ai import set_chat_model
+    set_chat_model(FakeChatModel(args.chat_latency_ms, args.chat_jitter_ms, args.chat_error_rate, rng))
+    return supabase
+
+
+# --- Traffic ---
+
+def random_answers(questions, rng, answered=0.9):
+    return [
+        {"question_id": q["id"], "selected_option": rng.choice(["A", "B", "C"])}
+        for q in questions if rng.random() < answered
+    ]
+
+
+def random_climate(rng, steps):
+    # One year starting in January: a wet season peaking around the turn of the year
+    peak = rng.uniform(150, 400) * 12 / steps
+    rain = [round(peak * (0.55 + 0.45 * np.cos(2 * np.pi * i / steps)) * rng.uniform(0.7, 1.3), 1) for i in range(steps)]
+    base = rng.uniform(18, 30)
+    temp = [round(base + 2 * np.sin(2 * np.pi * i / steps) + rng.uniform(-1, 1), 1) for i in range(steps)]
+    return rain, temp
+
+
+class Traffic:
+    def __init__(self, client, questions, rng):
+        self.client, self.questions, self.rng = client, questions, rng
+        self.sessions = []
+        self.bundle_etag = None
+
+    async def questions_route(self):
+        return "GET /api/questions", await self.client.get("/api/questions")
+
+    async def next_questions(self):
+        payload = {"answers": random_answers(self.questions, self.rng, answered=self.rng.random()), "top_k": 3}
+        return "POST /api/questions/next", await self.client.post("/api/questions/next", json=payload)
+
+    async def recommend(self):
+        payload = {"answers": random_answers(self.questions, self.rng)}
+        return "POST /api/recommend", await self.client.post("/api/recommend", json=payload)
+
+    async def whatif(self):
+        # Mostly resubmissions with one changed answer, like users going back in the wizard
+        if self.sessions and self.rng.random() < 0.7:
+            session_id, answers = self.rng.choice(self.sessions)
+            changed = self.rng.randrange(len(answers))
+            answers[changed] = dict(answers[changed], selected_option=self.rng.choice(["A", "B", "C"]))
+            response = await self.client.post(f"/api/whatif/{session_id}", json={"answers": answers})
+            return "POST /api/whatif/{id}", response
+
+        answers = random_answers(self.questions, self.rng, answered=1.0)
+        response = await self.client.post("/api/whatif", json={"answers": answers})
+        if response.status_code == 200:
+            self.sessions.append((response.json()["session_id"], answers))
+            self.sessions = self.sessions[-200:]
+        return "POST /api/whatif", response
+
+    async def sensitivity(self):
+        payload = {"answers": random_answers(self.questions, self.rng), "samples": 1000}
+        return "POST /api/sensitivity", await self.client.post("/api/sensitivity", json=payload)
+
+    async def bundle(self):
+        # Returning browsers revalidate their stored bundle (mostly 304)
+        headers = {"If-None-Match": self.bundle_etag} if self.bundle_etag else {}
+        response = await self.client.get("/api/catalog/bundle", headers=headers)
+        self.bundle_etag = response.headers.get("etag", self.bundle_etag)
+        return "GET /api/catalog/bundle", response
+
+    async def telemetry(self):
+        events = [{"answers": random_answers(self.questions, self.rng)} for _ in range(10)]
+        return "POST /api/telemetry", await self.client.post("/api/telemetry", json={"events": events})
+
+    async def seasonal(self):
+        rain, temp = random_climate(self.rng, self.rng.choice([12, 52]))
+        payload = {"answers": random_answers(self.questions, self.rng), "rain": rain, "temp": temp, "top_k": 10}
+        return "POST /api/recommend/seasonal", await self.client.post("/api/recommend/seasonal", json=payload)
+
+    async def batch(self):
+        # A farm upload: 50 locations with monthly series
+        farms = []
+        for i in range(50):
+            rain, temp = random_climate(self.rng, 12)
+            farms.append({"id": str(i), "answers": random_answers(self.questions, self.rng), "rain": rain, "temp": temp})
+        response = await self.client.post("/api/recommend/seasonal/batch", json={"farms": farms, "top_k": 5})
+        return "POST /api/recommend/seasonal/batch", response
+
+    async def chat(self):
+        payload = {"message": self.rng.choice(CHAT_MESSAGES), "history": []}
+        return "POST /api/chat", await self.client.post("/api/chat", json=payload)
+
+
+def parse_mix(mix):
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+
+async def run(args):
+    rng = random.Random(args.seed)
+
+    # Import the app with its startup prints silenced, then swap in the fakes
+    with contextlib.redirect_stdout(io.StringIO()):
+        from api.index import app
+    install_fakes(args, rng)
+    if args.chat_cache:
+        from app.chat_cache import chat_cache
+        chat_cache.enabled = True
+
+    transport = httpx.ASGITransport(app=app)
+    results = []
+    async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=args.timeout) as client:
+        questions = (await client.get("/api/questions")).json()
+        traffic = Traffic(client, questions, rng)
+        routes = {
+            "questions": traffic.questions_route,
+            "next": traffic.next_questions,
+            "recommend": traffic.recommend,
+            "whatif": traffic.whatif,
+            "sensitivity": traffic.sensitivity,
+            "chat": traffic.chat,
+            "bundle": traffic.bundle,
+            "telemetry": traffic.telemetry,
+            "seasonal": traffic.seasonal,
+            "batch": traffic.batch,
+        }
+        weights = parse_mix(args.mix)
+        unknown = set(weights) - set(routes)
+        if unknown:
+            raise SystemExit(f"Unknown route(s) in --mix: {', '.join(sorted(unknown))}")
+        names = list(weights)
+        probabilities = [weights[n] for n in names]
+
+        async def one(name):
+            start = time.perf_counter()
+            try:
+                route, response = await routes[name]()
+                ok = response.status_code < 400 and not _is_chat_error(route, response)
+            except Exception:
+                route, ok = name, False
+            results.append((route, time.perf_counter() - start, ok))
+
+        # Open-loop schedule: requests start at the target rate regardless of how
+        # long earlier ones take, so queueing shows up as latency.
+        total = int(args.rps * args.duration)
+        tasks = []
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            for i in range(total):
+                delay = started + i / args.rps - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                tasks.append(asyncio.create_task(one(rng.choices(names, probabilities)[0])))
+            await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+
+    return results, elapsed
+
+
+def _is_chat_error(route, response):
+    # /api/chat reports model failures with a 200 and an apology message
+    return route == "POST /api/chat" and "terjadi kesalahan" in response.json().get("response", "")
+
+
+def summarize(results, elapsed):
+    by_route = {}
+    for route, latency, ok in results:
+        by_route.setdefault(route, []).append((latency, ok))
+    by_route["ALL"] = [(latency, ok) for _, latency, ok in results]
+
+    summary = {}
+    for route, samples in by_route.items():
+        latencies = np.array([s[0] for s in samples]) * 1000
+        errors = sum(1 for s in samples if not s[1])
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) if len(latencies) else (0, 0, 0)
+        summary[route] = {
+            "requests": len(samples),
+            "throughput_rps": round(len(samples) / elapsed, 2),
+            "errors": errors,
+            "error_rate": round(errors / len(samples), 4) if samples else 0.0,
+            "p50_ms": round(float(p50), 2),
+            "p95_ms": round(float(p95), 2),
+            "p99_ms": round(float(p99), 2),
+        }
+    return summary
+
+
+def print_report(summary, args, elapsed):
+    print(f"\n--- Load test: target {args.rps} rps for {args.duration}s, {args.crops} crops, "
+          f"chat latency {args.chat_latency_ms}ms (took {elapsed:.1f}s) ---")
+    print(f"{'route':<36}{'reqs':>7}{'rps':>9}{'err%':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for route in sorted(summary, key=lambda r: (r == "ALL", r)):
+        s = summary[route]
+        print(f"{route:<36}{s['requests']:>7}{s['throughput_rps']:>9.1f}{s['error_rate'] * 100:>7.1f}%"
+              f"{s['p50_ms']:>10.1f}{s['p95_ms']:>10.1f}{s['p99_ms']:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="In-process load test with fake Supabase and Gemini.")
+    parser.add_argument("--rps", type=float, default=50, help="Target request rate")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds of traffic to generate")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Route weights (default: {DEFAULT_MIX})")
+    parser.add_argument("--crops", type=int, default=len(SEED_CROPS), help="Catalog size (seed rows + synthetic)")
+    parser.add_argument("--chat-latency-ms", type=float, default=300, help="Fake chat model latency")
+    parser.add_argument("--chat-jitter-ms", type=float, default=100, help="+/- jitter on the fake latency")
+    parser.add_argument("--chat-error-rate", type=float, default=0.0, help="Fraction of fake model calls that fail")
+    parser.add_argument("--chat-cache", action="store_true", help="Enable the chat response cache")
+    parser.add_argument("--timeout", type=float, default=30, help="Per-request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="Print the summary as JSON")
+    parser.add_argument("--max-p95-ms", type=float, help="Fail (exit 1) if overall p95 exceeds this")
+    parser.add_argument("--max-error-rate", type=float, help="Fail (exit 1) if overall error rate exceeds this")
+    args = parser.parse_args()
+
+    results, elapsed = asyncio.run(run(args))
+    summary = summarize(results, elapsed)
+
+    from app.chat_cache import chat_cache
+    cache_stats = chat_cache.stats()
+
+    if args.json:
+        if cache_stats.enabled:
+            summary["chat_cache"] = cache_stats.model_dump()
+        print(json.dumps(summary, indent=2))
+        summary.pop("chat_cache", None)
+    else:
+        print_report(summary, args, elapsed)
+        if cache_stats.enabled:
+            print(f"chat cache: {cache_stats.hits} hits, {cache_stats.misses} misses, "
+                  f"{cache_stats.bypassed} bypassed, hit ratio {cache_stats.hit_ratio:.1%}")
+
+    overall = summary["ALL"]
+    failed = []
+    if args.max_p95_ms is not None and overall["p95_ms"] > args.max_p95_ms:
+        failed.append(f"p95 {overall['p95_ms']}ms > {args.max_p95_ms}ms")
+    if args.max_error_rate is not None and overall["error_rate"] > args.max_error_rate:
+        failed.append(f"error rate {overall['error_rate']} > {args.max_error_rate}")
+    if failed:
+        print("FAILED: " + "; ".join(failed))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -14,9 +14,39 @@ CREATE TABLE IF NOT EXISTS crops (
     sun_requirement TEXT NOT NULL, -- 'Low', 'Medium', 'High'
     soil_type TEXT NOT NULL, -- 'Sandy', 'Clay', 'Loam', 'Silt'
     irrigation_need TEXT NOT NULL, -- 'Low', 'Medium', 'High'
-    description TEXT
+    description TEXT,
+    season_months INTEGER CHECK (season_months BETWEEN 1 AND 12) -- growing season length; NULL = 4 months
 );
 
+-- Added for seasonal scoring (app/seasonal.py); no-op on new databases
+ALTER TABLE crops ADD COLUMN IF NOT EXISTS season_months INTEGER CHECK (season_months BETWEEN 1 AND 12);
+
+-- Crop name is the natural key used by bulk import upserts (app/importer.py).
+-- Older databases may hold duplicate seed rows (the seed used to be re-inserted on every
+-- run): keep one row per name before the unique index is created. No-op once unique.
+DELETE FROM crops a USING crops b
+WHERE a.name = b.name AND a.ctid > b.ctid;
+
+CREATE UNIQUE INDEX IF NOT EXISTS crops_name_key ON crops (name);
+
+-- Catalog version, bumped after every bulk import so app caches reload the catalog
+CREATE TABLE IF NOT EXISTS catalog_meta (
+    key TEXT PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 1,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+INSERT INTO catalog_meta (key, version) VALUES ('crops', 1) ON CONFLICT (key) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION bump_catalog_version() RETURNS BIGINT AS $$
+    UPDATE catalog_meta SET version = version + 1, updated_at = NOW()
+    WHERE key = 'crops'
+    RETURNING version;
+$$ LANGUAGE sql;
+
+-- Only the importer (service key) may bump the version; anon clients would force catalog reloads
+REVOKE EXECUTE ON FUNCTION bump_catalog_version() FROM PUBLIC, anon, authenticated;
+
 -- Table for User Inputs
 CREATE TABLE IF NOT EXISTS user_inputs (
     id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
@@ -30,13 +60,140 @@ CREATE TABLE IF NOT EXISTS user_inputs (
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
+-- Keyset pagination for analytics export (ORDER BY created_at, id)
+CREATE INDEX IF NOT EXISTS user_inputs_created_at_id_idx ON user_inputs (created_at, id);
+
+-- Aggregates over user_inputs, maintained incrementally by a trigger so analytics
+-- never rescans the table. Bucket widths must match HISTOGRAM_BUCKETS in app/analytics.py.
+-- Every counter is split over 16 shard rows (one shard per inserting transaction) so
+-- concurrent inserts do not queue on a single hot row; readers sum the shards.
+CREATE TABLE IF NOT EXISTS user_input_histograms (
+    metric TEXT NOT NULL, -- 'ph', 'rain', 'temp'
+    bucket FLOAT NOT NULL, -- lower bound of the bucket
+    shard SMALLINT NOT NULL DEFAULT 0,
+    count BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (metric, bucket, shard)
+);
+
+CREATE TABLE IF NOT EXISTS user_input_soil_counts (
+    soil_type TEXT NOT NULL,
+    shard SMALLINT NOT NULL DEFAULT 0,
+    count BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (soil_type, shard)
+);
+
+CREATE TABLE IF NOT EXISTS user_input_hourly_counts (
+    bucket TIMESTAMP WITH TIME ZONE NOT NULL, -- date_trunc('hour', created_at)
+    shard SMALLINT NOT NULL DEFAULT 0,
+    count BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (bucket, shard)
+);
+
+-- Existing databases: add the shard column to the primary keys (no-op once done)
+DO $$
+DECLARE
+    t TEXT;
+    key_columns TEXT;
+BEGIN
+    FOR t, key_columns IN VALUES
+        ('user_input_histograms', 'metric, bucket, shard'),
+        ('user_input_soil_counts', 'soil_type, shard'),
+        ('user_input_hourly_counts', 'bucket, shard')
+    LOOP
+        EXECUTE format('ALTER TABLE %I ADD COLUMN IF NOT EXISTS shard SMALLINT NOT NULL DEFAULT 0', t);
+        IF NOT EXISTS (
+            SELECT 1 FROM pg_index i
+            JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY (i.indkey)
+            WHERE i.indrelid = t::regclass AND i.indisprimary AND a.attname = 'shard'
+        ) THEN
+            EXECUTE format('ALTER TABLE %I DROP CONSTRAINT IF EXISTS %I', t, t || '_pkey');
+            EXECUTE format('ALTER TABLE %I ADD PRIMARY KEY (%s)', t, key_columns);
+        END IF;
+    END LOOP;
+END $$;
+
+-- Aggregates are admin-only (read by the server with the service role key, see
+-- app/database.py). RLS without policies plus revoked grants keeps them out of
+-- PostgREST for the anon key that ships to browsers.
+ALTER TABLE user_input_histograms ENABLE ROW LEVEL SECURITY;
+ALTER TABLE user_input_soil_counts ENABLE ROW LEVEL SECURITY;
+ALTER TABLE user_input_hourly_counts ENABLE ROW LEVEL SECURITY;
+REVOKE ALL ON user_input_histograms, user_input_soil_counts, user_input_hourly_counts FROM anon, authenticated;
+
+-- Statement-level: a multi-row insert (telemetry batches) is aggregated once per bucket.
+-- Rows are upserted in key order so concurrent transactions lock them in the same order.
+-- SECURITY DEFINER: inserts made with the anon key still update the locked-down aggregates.
+CREATE OR REPLACE FUNCTION track_user_input() RETURNS TRIGGER
+LANGUAGE plpgsql SECURITY DEFINER SET search_path = public AS $$
+DECLARE
+    v_shard SMALLINT := (txid_current() % 16)::SMALLINT;
+BEGIN
+    INSERT INTO user_input_histograms (metric, bucket, shard, count)
+    SELECT metric, floor(value / width) * width AS value_bucket, v_shard, COUNT(*)
+    FROM new_rows,
+        LATERAL (VALUES ('ph', ph_value, 0.5), ('rain', rain_value, 250.0), ('temp', temp_value, 2.0))
+        AS v(metric, value, width)
+    WHERE value IS NOT NULL
+    GROUP BY metric, value_bucket
+    ORDER BY metric, value_bucket
+    ON CONFLICT (metric, bucket, shard) DO UPDATE SET count = user_input_histograms.count + EXCLUDED.count;
+
+    INSERT INTO user_input_soil_counts (soil_type, shard, count)
+    SELECT soil_type, v_shard, COUNT(*) FROM new_rows
+    WHERE soil_type IS NOT NULL
+    GROUP BY soil_type
+    ORDER BY soil_type
+    ON CONFLICT (soil_type, shard) DO UPDATE SET count = user_input_soil_counts.count + EXCLUDED.count;
+
+    INSERT INTO user_input_hourly_counts (bucket, shard, count)
+    SELECT date_trunc('hour', COALESCE(created_at, NOW())) AS hour_bucket, v_shard, COUNT(*) FROM new_rows
+    GROUP BY hour_bucket
+    ORDER BY hour_bucket
+    ON CONFLICT (bucket, shard) DO UPDATE SET count = user_input_hourly_counts.count + EXCLUDED.count;
+
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS user_inputs_track ON user_inputs;
+CREATE TRIGGER user_inputs_track AFTER INSERT ON user_inputs
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION track_user_input();
+
+REVOKE EXECUTE ON FUNCTION track_user_input() FROM PUBLIC, anon, authenticated;
+
+-- One-time backfill for rows inserted before the trigger existed: SELECT rebuild_user_input_stats();
+CREATE OR REPLACE FUNCTION rebuild_user_input_stats() RETURNS VOID AS $$
+BEGIN
+    TRUNCATE user_input_histograms, user_input_soil_counts, user_input_hourly_counts;
+
+    INSERT INTO user_input_histograms (metric, bucket, count)
+    SELECT metric, floor(value / width) * width AS bucket, COUNT(*)
+    FROM user_inputs,
+        LATERAL (VALUES ('ph', ph_value, 0.5), ('rain', rain_value, 250.0), ('temp', temp_value, 2.0))
+        AS v(metric, value, width)
+    WHERE value IS NOT NULL
+    GROUP BY metric, bucket;
+
+    INSERT INTO user_input_soil_counts (soil_type, count)
+    SELECT soil_type, COUNT(*) FROM user_inputs WHERE soil_type IS NOT NULL GROUP BY soil_type;
+
+    INSERT INTO user_input_hourly_counts (bucket, count)
+    SELECT date_trunc('hour', created_at), COUNT(*) FROM user_inputs
+    WHERE created_at IS NOT NULL GROUP BY 1;
+END;
+$$ LANGUAGE plpgsql;
+
+REVOKE EXECUTE ON FUNCTION rebuild_user_input_stats() FROM PUBLIC, anon, authenticated;
+
 -- Seed Data for Crops
-INSERT INTO crops (name, ph_min, ph_max, rain_min, rain_max, temp_min, temp_max, sun_requirement, soil_type, irrigation_need, description)
+INSERT INTO crops (name, ph_min, ph_max, rain_min, rain_max, temp_min, temp_max, sun_requirement, soil_type, irrigation_need, description, season_months)
 VALUES
-('Padi', 5.0, 7.0, 1500, 2500, 20, 35, 'High', 'Clay', 'High', 'Tanaman pangan utama, butuh banyak air.'),
-('Jagung', 5.5, 7.5, 500, 1500, 18, 32, 'High', 'Loam', 'Medium', 'Tanaman palawija, toleran kekeringan sedang.'),
-('Cabai', 5.5, 6.8, 600, 1200, 18, 30, 'High', 'Sandy Loam', 'Medium', 'Butuh drainase baik, tidak tahan genangan.'),
-('Tomat', 6.0, 7.0, 600, 1500, 18, 27, 'High', 'Loam', 'Medium', 'Sensitif terhadap kelembaban tinggi.'),
-('Bawang Merah', 6.0, 7.0, 350, 1000, 25, 32, 'High', 'Loam', 'Medium', 'Butuh cuaca cerah dan tanah gembur.'),
-('Kentang', 5.0, 6.5, 1500, 2500, 15, 20, 'Medium', 'Loam', 'Medium', 'Tanaman dataran tinggi, suhu sejuk.'),
-('Sawi', 6.0, 7.0, 1000, 2000, 20, 30, 'Medium', 'Loam', 'High', 'Sayuran daun, masa panen cepat.');
+('Padi', 5.0, 7.0, 1500, 2500, 20, 35, 'High', 'Clay', 'High', 'Tanaman pangan utama, butuh banyak air.', 4),
+('Jagung', 5.5, 7.5, 500, 1500, 18, 32, 'High', 'Loam', 'Medium', 'Tanaman palawija, toleran kekeringan sedang.', 3),
+('Cabai', 5.5, 6.8, 600, 1200, 18, 30, 'High', 'Sandy Loam', 'Medium', 'Butuh drainase baik, tidak tahan genangan.', 5),
+('Tomat', 6.0, 7.0, 600, 1500, 18, 27, 'High', 'Loam', 'Medium', 'Sensitif terhadap kelembaban tinggi.', 3),
+('Bawang Merah', 6.0, 7.0, 350, 1000, 25, 32, 'High', 'Loam', 'Medium', 'Butuh cuaca cerah dan tanah gembur.', 2),
+('Kentang', 5.0, 6.5, 1500, 2500, 15, 20, 'Medium', 'Loam', 'Medium', 'Tanaman dataran tinggi, suhu sejuk.', 4),
+('Sawi', 6.0, 7.0, 1000, 2000, 20, 30, 'Medium', 'Loam', 'High', 'Sayuran daun, masa panen cepat.', 1)
+ON CONFLICT (name) DO NOTHING;
@@ -0,0 +1,215 @@
+// Client-side ranking from the versioned catalog bundle (/api/catalog/bundle).
+// Mirrors app/mapping.py (answers -> technical values) and app/ahp.py (match scores,
+// weighted sum). The bundle is only used after every server test vector reproduces;
+// otherwise callers fall back to the server.
+(function () {
+    const BUNDLE_FORMAT = 1;
+    const BUNDLE_KEY = 'catalogBundle';
+    const QUEUE_KEY = 'telemetryQueue';
+    const BATCH_SIZE = 10; // Upload telemetry once this many submissions are queued
+    const FLUSH_DELAY_MS = 30000; // ...or this long after the first one
+    const MAX_QUEUE = 200;
+    const SCORE_TOLERANCE = 1e-4; // Scores are rounded to 4 decimals on both sides
+    const VALUE_TOLERANCE = 1e-9;
+
+    let flushTimer = null;
+
+    // Python's round(): halves go to the even neighbour (2.5 -> 2)
+    function roundHalfEven(x) {
+        const floor = Math.floor(x);
+        const diff = x - floor;
+        if (diff > 0.5) return floor + 1;
+        if (diff < 0.5) return floor;
+        return floor % 2 === 0 ? floor : floor + 1;
+    }
+
+    function technicalValues(bundle, answers) {
+        const grouped = {};
+        bundle.criteria.forEach(cat => { grouped[cat] = []; });
+        answers.forEach(ans => {
+            const question = bundle.questions[ans.question_id];
+            if (!question) return;
+            const value = question.values[ans.selected_option];
+            if (value !== undefined) grouped[question.category].push(value);
+        });
+
+        const values = {};
+        Object.keys(grouped).forEach(cat => {
+            const vals = grouped[cat];
+            if (vals.length === 0) {
+                values[cat] = bundle.defaults[cat];
+                return;
+            }
+            const avg = vals.reduce((sum, v) => sum + v, 0) / vals.length;
+            values[cat] = cat === 'soil'
+                ? (bundle.soil_reverse[String(roundHalfEven(avg))] || 'Loam')
+                : avg;
+        });
+        return values;
+    }
+
+    function rangeScore(user, min, max) {
+        if (min <= user && user <= max) return 1.0;
+        let width = max - min;
+        if (width === 0) width = 1;
+        const tolerance = width * 0.5;
+        const dist = Math.min(Math.abs(user - min), Math.abs(user - max));
+        return Math.max(0, 1.0 - dist / tolerance);
+    }
+
+    function soilRow(bundle, soil) {
+        const key = String(soil).toLowerCase().split(/\s+/).filter(Boolean).join(' ');
+        const code = bundle.soil.codes[key];
+        return code === undefined ? null : bundle.soil.matrix[code];
+    }
+
+    // Same output shape as the server's recommendations (sorted, score rounded to 4 decimals)
+    function rank(bundle, values) {
+        const crops = bundle.crops;
+        const spread = bundle.level_tolerance;
+        const weights = bundle.weights;
+        const soil = soilRow(bundle, values.soil);
+        const results = [];
+
+        for (let i = 0; i < crops.name.length; i++) {
+            const details = {
+                ph: rangeScore(values.ph, crops.ph_min[i], crops.ph_max[i]),
+                rain: rangeScore(values.rain, crops.rain_min[i], crops.rain_max[i]),
+                temp: rangeScore(values.temp, crops.temp_min[i], crops.temp_max[i]),
+                sun: rangeScore(values.sun, crops.sun[i] - spread, crops.sun[i] + spread),
+                irrigation: rangeScore(values.irrigation, crops.irrigation[i] - spread, crops.irrigation[i] + spread),
+                soil: soil ? soil[crops.soil[i]] : 0.0
+            };
+            let score = 0;
+            bundle.criteria.forEach((criterion, j) => { score += weights[j] * details[criterion]; });
+            results.push({
+                crop_name: crops.name[i],
+                score: Math.round(score * 1e4) / 1e4,
+                match_details: details
+            });
+        }
+        // Array.prototype.sort is stable, like Python's sort on the server
+        return results.sort((a, b) => b.score - a.score);
+    }
+
+    function close(a, b, tolerance) {
+        return Math.abs(a - b) <= tolerance;
+    }
+
+    // True only if this implementation reproduces every server test vector
+    function verify(bundle) {
+        if (!bundle || bundle.format !== BUNDLE_FORMAT || bundle.method !== 'ahp') return false;
+        return bundle.test_vectors.every(vector => {
+            const values = technicalValues(bundle, vector.answers);
+            const valuesMatch = bundle.criteria.every(cat => (
+                cat === 'soil'
+                    ? values[cat] === vector.values[cat]
+                    : close(values[cat], vector.values[cat], VALUE_TOLERANCE)
+            ));
+            if (!valuesMatch) return false;
+
+            const ranking = rank(bundle, values);
+            const byName = new Map(ranking.map(rec => [rec.crop_name, rec.score]));
+            // Positions are compared by score so that ties may be ordered either way
+            return vector.ranking.every(([name, score], position) => (
+                ranking[position] !== undefined
+                && close(ranking[position].score, score, SCORE_TOLERANCE)
+                && byName.has(name)
+                && close(byName.get(name), score, SCORE_TOLERANCE)
+            ));
+        });
+    }
+
+    function readStorage(key) {
+        try {
+            return JSON.parse(localStorage.getItem(key));
+        } catch (error) {
+            return null;
+        }
+    }
+
+    function writeStorage(key, value) {
+        try {
+            localStorage.setItem(key, JSON.stringify(value));
+        } catch (error) {
+            // Quota exceeded or storage disabled: keep working from memory
+        }
+    }
+
+    // Revalidates the stored bundle with its ETag; works offline from the stored copy.
+    // Resolves to a verified bundle, or null if the client must use the server.
+    async function load() {
+        const stored = readStorage(BUNDLE_KEY);
+        let bundle = stored ? stored.bundle : null;
+        try {
+            const headers = stored && stored.etag ? { 'If-None-Match': stored.etag } : {};
+            const response = await fetch('/api/catalog/bundle', { headers, cache: 'no-store' });
+            if (response.ok) {
+                bundle = await response.json();
+                writeStorage(BUNDLE_KEY, { etag: response.headers.get('ETag'), bundle });
+            } else if (response.status !== 304) {
+                throw new Error('Failed to fetch catalog bundle');
+            }
+        } catch (error) {
+            console.error(error);
+        }
+        if (!verify(bundle)) {
+            if (bundle) console.warn('Catalog bundle failed verification; ranking on the server');
+            return null;
+        }
+        return bundle;
+    }
+
+    // --- Telemetry: submissions ranked here are uploaded to the server in batches ---
+    function recordSubmission(answers) {
+        const queue = readStorage(QUEUE_KEY) || [];
+        queue.push({ answers });
+        writeStorage(QUEUE_KEY, queue.slice(-MAX_QUEUE));
+
+        if (queue.length >= BATCH_SIZE) {
+            flush();
+        } else if (!flushTimer) {
+            flushTimer = setTimeout(flush, FLUSH_DELAY_MS);
+        }
+    }
+
+    async function flush() {
+        clearTimeout(flushTimer);
+        flushTimer = null;
+        const queue = readStorage(QUEUE_KEY) || [];
+        if (queue.length === 0) return;
+
+        const batch = queue.slice(0, 50);
+        try {
+            const response = await fetch('/api/telemetry', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ events: batch }),
+                keepalive: true
+            });
+            if (!response.ok) throw new Error('Failed to upload telemetry');
+            // Drop what was sent; submissions queued meanwhile stay for the next batch
+            writeStorage(QUEUE_KEY, (readStorage(QUEUE_KEY) || []).slice(batch.length));
+        } catch (error) {
+            // Kept in storage and retried with the next batch
+            console.error(error);
+        }
+    }
+
+    // Last chance to upload before the page goes away
+    function flushOnExit() {
+        const queue = readStorage(QUEUE_KEY) || [];
+        if (queue.length === 0 || !navigator.sendBeacon) return;
+        const batch = queue.slice(0, 50);
+        const body = new Blob([JSON.stringify({ events: batch })], { type: 'application/json' });
+        if (navigator.sendBeacon('/api/telemetry', body)) {
+            writeStorage(QUEUE_KEY, queue.slice(batch.length));
+        }
+    }
+
+    document.addEventListener('visibilitychange', () => {
+        if (document.visibilityState === 'hidden') flushOnExit();
+    });
+
+    window.CatalogRanking = { load, verify, technicalValues, rank, recordSubmission, flush };
+})();
@@ -14,6 +14,12 @@ document.addEventListener('DOMContentLoaded', () => {
     let questions = [];
     let userAnswers = {}; // Map question_id -> selected_option (A, B, C)
     let steps = []; // Array of arrays, chunking questions into steps
+    let allSteps = []; // Every step, before adaptive pruning
+    const TOP_K = 3; // Adaptive mode stops once the top-3 crops can no longer change
+    let sessionId = null; // What-if session from the last submission
+    let lastRecommendations = []; // Ranking from the last submission (sorted)
+    let bundle = null; // Verified catalog bundle for ranking in the browser (ranking.js)
+    let nextRequest = 0; // Latest /api/questions/next call; older responses are ignored
 
     // Grouping configuration: How many questions per page?
     // Let's group by category or just constant number.
@@ -34,11 +40,15 @@ document.addEventListener('DOMContentLoaded', () => {
             });
 
             // Convert grouped object to array of steps
-            steps = Object.values(grouped);
+            allSteps = Object.values(grouped);
+            steps = allSteps;
 
             // Render first step
             renderStep();
             updateNavigation();
+
+            // Load the catalog bundle in the background; until then submissions go to the server
+            CatalogRanking.load().then(result => { bundle = result; });
         } catch (error) {
             console.error(error);
             questionContainer.innerHTML = '<p class="error">Gagal memuat pertanyaan. Silakan refresh halaman.</p>';
@@ -107,7 +117,10 @@ document.addEventListener('DOMContentLoaded', () => {
             questionContainer.appendChild(qDiv);
         });
 
-        // Update Progress
+        updateProgress();
+    }
+
+    function updateProgress() {
         const progress = ((currentStep + 1) / steps.length) * 100;
         progressFill.style.width = `${progress}%`;
     }
@@ -132,16 +145,70 @@ document.addEventListener('DOMContentLoaded', () => {
     }
 
     nextBtn.addEventListener('click', () => {
-        if (currentStep < steps.length - 1) {
-            currentStep++;
-            renderStep();
+        if (currentStep >= steps.length - 1) return;
+
+        // Advance right away; the server answers which remaining questions can still change
+        // the top-k, and the steps after the one just completed are pruned when it arrives.
+        const completed = currentStep;
+        const request = ++nextRequest;
+        fetchNextQuestions().then(next => {
+            // Ignore stale answers: a newer Next, Back or restart happened in the meantime
+            if (!next || request !== nextRequest) return;
+            if (next.done) {
+                wizardForm.requestSubmit();
+                return;
+            }
+            const shown = steps[currentStep].map(q => q.id).join();
+            pruneSteps(next.questions, completed);
+            if (currentStep >= steps.length) {
+                wizardForm.requestSubmit();
+                return;
+            }
+            if (steps[currentStep].map(q => q.id).join() !== shown) {
+                renderStep();
+            } else {
+                updateProgress();
+            }
             updateNavigation();
-            window.scrollTo(0, 0);
-        }
+        });
+
+        currentStep++;
+        renderStep();
+        updateNavigation();
+        window.scrollTo(0, 0);
     });
 
+    async function fetchNextQuestions() {
+        try {
+            const response = await fetch('/api/questions/next', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ answers: answersList(), top_k: TOP_K })
+            });
+            if (!response.ok) throw new Error('Failed to fetch next questions');
+            return await response.json();
+        } catch (error) {
+            // Fall back to the full questionnaire
+            console.error(error);
+            return null;
+        }
+    }
+
+    function pruneSteps(remaining, completed) {
+        // Steps up to the completed one stay as they are (so "back" still works);
+        // later steps keep only questions that still matter or were already answered.
+        const keep = new Set(remaining.map(q => q.id));
+        const category = steps[completed][0].category;
+        const position = allSteps.findIndex(step => step[0].category === category);
+        const later = allSteps.slice(position + 1)
+            .map(step => step.filter(q => keep.has(q.id) || userAnswers[q.id]))
+            .filter(step => step.length > 0);
+        steps = steps.slice(0, completed + 1).concat(later);
+    }
+
     prevBtn.addEventListener('click', () => {
         if (currentStep > 0) {
+            nextRequest++; // answers may change again, so a pending prune no longer applies
             currentStep--;
             renderStep();
             updateNavigation();
@@ -151,27 +218,14 @@ document.addEventListener('DOMContentLoaded', () => {
 
     wizardForm.addEventListener('submit', async (e) => {
         e.preventDefault();
+        nextRequest++;
         loadingDiv.classList.remove('hidden');
 
-        // Prepare payload: List of {question_id: "...", selected_option: "..."}
-        const answersList = Object.keys(userAnswers).map(qid => ({
-            question_id: qid,
-            selected_option: userAnswers[qid]
-        }));
-
-        const payload = { answers: answersList };
+        const payload = { answers: answersList() };
 
         try {
-            const response = await fetch('/api/recommend', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify(payload)
-            });
-
-            if (!response.ok) throw new Error('Network response was not ok');
-
-            const result = await response.json();
-            displayResults(result.recommendations);
+            const recommendations = await submitAnswers(payload);
+            displayResults(recommendations);
 
             wizardForm.classList.add('hidden');
             resultsDiv.classList.remove('hidden');
@@ -184,6 +238,72 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     });
 
+    // With a verified catalog bundle the ranking runs locally and the submission is
+    // queued as telemetry. Otherwise resubmissions reuse the server-side what-if
+    // session: the server only rescores the categories whose answers changed and returns a diff.
+    async function submitAnswers(payload) {
+        if (bundle) {
+            const values = CatalogRanking.technicalValues(bundle, payload.answers);
+            lastRecommendations = CatalogRanking.rank(bundle, values);
+            CatalogRanking.recordSubmission(payload.answers);
+            return lastRecommendations;
+        }
+
+        if (sessionId) {
+            const response = await fetch(`/api/whatif/${sessionId}`, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify(payload)
+            });
+
+            if (response.ok) {
+                const diff = await response.json();
+                return applyDiff(diff.changes);
+            }
+            // Session expired (or served by another instance): start a new one
+            if (response.status !== 404) throw new Error('Network response was not ok');
+        }
+
+        const response = await fetch('/api/whatif', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(payload)
+        });
+
+        if (!response.ok) throw new Error('Network response was not ok');
+
+        const result = await response.json();
+        sessionId = result.session_id;
+        lastRecommendations = result.recommendations;
+        return lastRecommendations;
+    }
+
+    // Payload format: List of {question_id: "...", selected_option: "..."}
+    function answersList() {
+        return Object.keys(userAnswers).map(qid => ({
+            question_id: qid,
+            selected_option: userAnswers[qid]
+        }));
+    }
+
+    function applyDiff(changes) {
+        const ranks = new Map(lastRecommendations.map((rec, index) => [rec.crop_name, index + 1]));
+        const byName = new Map(lastRecommendations.map(rec => [rec.crop_name, rec]));
+
+        changes.forEach(change => {
+            byName.set(change.crop_name, {
+                crop_name: change.crop_name,
+                score: change.score,
+                match_details: change.match_details
+            });
+            ranks.set(change.crop_name, change.rank);
+        });
+
+        lastRecommendations = Array.from(byName.values())
+            .sort((a, b) => ranks.get(a.crop_name) - ranks.get(b.crop_name));
+        return lastRecommendations;
+    }
+
     function displayResults(recommendations) {
         recommendationList.innerHTML = '';
         if (recommendations.length === 0) {
@@ -214,8 +334,10 @@ document.addEventListener('DOMContentLoaded', () => {
     restartBtn.addEventListener('click', () => {
         resultsDiv.classList.add('hidden');
         wizardForm.classList.remove('hidden');
+        nextRequest++;
         currentStep = 0;
         userAnswers = {}; // Reset answers
+        steps = allSteps;
         renderStep();
         updateNavigation();
         window.scrollTo(0, 0);
@@ -0,0 +1,146 @@
+"""
+Checks app/seasonal.py against a naive per-window loop built on
+AHPCalculator.calculate_match_score. Run with: python -m pytest test_seasonal.py
+"""
+import random
+import numpy as np
+import pytest
+
+from app import seasonal
+from app.ahp import AHPCalculator, LEVEL_MAP, LEVEL_TOLERANCE, DEFAULT_SEASON_MONTHS
+from app.models import Crop
+from app.scoring import ScoringRegistry
+from app.seasonal import SeasonalScorer, window_sums
+
+SOILS = ["Clay", "Loam", "Sandy Loam", "Silt", "Sandy Clay Loam"]
+LEVELS = list(LEVEL_MAP)
+USER_INPUTS = {"ph": 6.2, "rain": 1800.0, "temp": 26.0, "sun": 0.8, "irrigation": 0.5, "soil": "Loam"}
+
+ahp = AHPCalculator()
+scoring = ScoringRegistry(ahp)
+
+
+def make_crops(n, seed=0):
+    rng = random.Random(seed)
+    crops = []
+    for i in range(n):
+        ph = rng.uniform(4.5, 7.5)
+        rain = rng.uniform(400, 3000)
+        temp = rng.uniform(12, 32)
+        crops.append(Crop(
+            id=str(i), name=f"crop-{i}",
+            ph_min=ph, ph_max=ph + rng.uniform(0, 1.5),
+            rain_min=rain, rain_max=rain + rng.uniform(0, 1500),
+            temp_min=temp, temp_max=temp + rng.uniform(0, 8),
+            sun_requirement=rng.choice(LEVELS), irrigation_need=rng.choice(LEVELS),
+            soil_type=rng.choice(SOILS),
+            season_months=rng.choice([None, 1, 2, 3, 4, 6, 9, 12]),
+        ))
+    return crops
+
+
+def make_series(steps, seed=0):
+    rng = np.random.default_rng(seed)
+    rain = rng.uniform(0, 400, steps) * 12 / steps
+    temp = rng.uniform(15, 33, steps)
+    return rain.tolist(), temp.tolist()
+
+
+def naive_window_matrix(crops, rain, temp):
+    """
+    (crops x windows x criteria), looping over every month/week of every window.
+    """
+    steps = len(rain)
+    matrix = np.empty((len(crops), steps, len(ahp.criteria)))
+    for i, crop in enumerate(crops):
+        months = crop.season_months or DEFAULT_SEASON_MONTHS
+        length = min(max(int(np.rint(months * steps / 12)), 1), steps)
+        static = {
+            "ph": ahp.calculate_match_score(USER_INPUTS["ph"], crop.ph_min, crop.ph_max),
+            "sun": ahp.calculate_match_score(USER_INPUTS["sun"], LEVEL_MAP[crop.sun_requirement] - LEVEL_TOLERANCE,
+                                             LEVEL_MAP[crop.sun_requirement] + LEVEL_TOLERANCE),
+            "irrigation": ahp.calculate_match_score(USER_INPUTS["irrigation"], LEVEL_MAP[crop.irrigation_need] - LEVEL_TOLERANCE,
+                                                    LEVEL_MAP[crop.irrigation_need] + LEVEL_TOLERANCE),
+            "soil": ahp.calculate_match_score(USER_INPUTS["soil"], 0, 0, is_categorical=True, crop_val=crop.soil_type),
+        }
+        for start in range(steps):
+            window = [(start + k) % steps for k in range(length)]
+            annual_rain = sum(rain[m] for m in window) * steps / length
+            values = dict(static)
+            values["rain"] = ahp.calculate_match_score(annual_rain, crop.rain_min, crop.rain_max)
+            values["temp"] = sum(ahp.calculate_match_score(temp[m], crop.temp_min, crop.temp_max) for m in window) / length
+            matrix[i, start] = [values[c] for c in ahp.criteria]
+    return matrix
+
+
+def naive_scores(matrix, engine):
+    n_crops, steps, n_criteria = matrix.shape
+    return engine.scores(matrix.reshape(-1, n_criteria)).reshape(n_crops, steps)
+
+
+def test_window_sums_matches_loop():
+    rng = np.random.default_rng(1)
+    for steps in (12, 52):
+        values = rng.uniform(0, 10, (7, steps))
+        lengths = rng.integers(1, steps + 1, 7)
+        expected = [[sum(values[i, (s + k) % steps] for k in range(lengths[i])) for s in range(steps)]
+                    for i in range(7)]
+        assert np.allclose(window_sums(values, lengths), expected)
+        # 1-D series shared by all crops
+        assert np.allclose(window_sums(values[0], lengths), [[sum(values[0, (s + k) % steps] for k in range(length))
+                                                              for s in range(steps)] for length in lengths])
+
+
+@pytest.mark.parametrize("steps", [12, 52])
+@pytest.mark.parametrize("method", ["ahp", "topsis", "fuzzy_ahp"])
+def test_rank_matches_naive_loop(steps, method):
+    crops = make_crops(40, seed=steps)
+    rain, temp = make_series(steps, seed=steps)
+    engine = scoring.get(method)
+    naive = naive_window_matrix(crops, rain, temp)
+    expected = naive_scores(naive, engine)
+
+    recommendations = SeasonalScorer(ahp).rank(USER_INPUTS, crops, rain, temp, engine, include_windows=True)
+    by_name = {r.crop_name: r for r in recommendations}
+    assert len(by_name) == len(crops)
+
+    for i, crop in enumerate(crops):
+        rec = by_name[crop.name]
+        assert np.allclose(rec.window_scores, np.round(expected[i], 4), atol=1.5e-4)
+        assert rec.score == pytest.approx(expected[i].max(), abs=1e-4)
+        # The chosen window must be a best naive window (any of them when tied)
+        assert expected[i, rec.best_start] == pytest.approx(expected[i].max(), abs=1e-9)
+        assert rec.best_month == rec.best_start * 12 // steps + 1
+        assert 1 <= rec.best_month <= 12
+        details = [getattr(rec.match_details, c) for c in ahp.criteria]
+        assert np.allclose(details, naive[i, rec.best_start])
+
+    scores = [r.score for r in recommendations]
+    assert scores == sorted(scores, reverse=True)
+
+
+@pytest.mark.parametrize("method", ["ahp", "topsis"])
+def test_top_k_and_chunks_match_full_ranking(method, monkeypatch):
+    crops = make_crops(300, seed=7)
+    # Duplicates create ties: the partitioned top-k must still equal the stable full sort
+    crops += [c.model_copy(update={"id": f"dup-{c.id}", "name": f"dup-{c.name}"}) for c in crops[:50]]
+    rain, temp = make_series(52, seed=7)
+    engine = scoring.get(method)
+    scorer = SeasonalScorer(ahp)
+
+    full = scorer.rank(USER_INPUTS, crops, rain, temp, engine)
+    for top_k in (1, 5, 37, len(crops) + 10):
+        assert scorer.rank(USER_INPUTS, crops, rain, temp, engine, top_k=top_k) == full[:top_k]
+
+    monkeypatch.setattr(seasonal, "CHUNK_CELLS", 52 * 7)
+    assert scorer.rank(USER_INPUTS, crops, rain, temp, engine) == full
+
+
+def test_size_limit(monkeypatch):
+    monkeypatch.setattr(seasonal, "MAX_CELLS", 6000)
+    seasonal.check_size(10, [52, 12, 12], 6, scoring.get("ahp"))
+    with pytest.raises(ValueError):
+        seasonal.check_size(10, [52, 52], 6, scoring.get("ahp"))
+    # TOPSIS reads every window twice (column statistics, then distances)
+    with pytest.raises(ValueError):
+        seasonal.check_size(10, [52, 12, 12], 6, scoring.get("topsis"))